@@ -1,10 +1,25 @@
 #!/usr/bin/env python
 """
-Nothing to see here.
+Make latex author lists from the csv files produced by the DES PubDB.
 """
 __author__ = "Alex Drlica-Wagner"
 __email__ = "kadrlica@fnal.gov"
 
-from ._version import get_versions
-__version__ = get_versions()['version']
-del get_versions
+from .mkauthlist import load, order, render, render_journals, write_contributions
+from .mkauthlist import iter_render, write_fragments
+from .mkauthlist import render_file, arender, arender_as_completed
+from .mkauthlist import read_table, write_table, to_arrow, from_arrow
+from .mkauthlist import Author, Affiliation, get_authors
+from .mkauthlist import Renderer, RenderConfig, register_renderer, get_renderer
+from .mkauthlist import journal2class
+from .mkauthlist import serve, fetch, PubDBClient
+from .mkauthlist import get_version
+
+def __getattr__(name):
+    """ Resolve '__version__' on first use (PEP 562).
+
+    This keeps 'import mkauthlist' from querying git in a source checkout.
+    """
+    if name == '__version__':
+        return get_version()
+    raise AttributeError("module %r has no attribute %r"%(__name__,name))
@@ -20,88 +20,1032 @@ Ordered authors - Tier 1 authors - Tier 2 authors
 
 __author__  = "Alex Drlica-Wagner"
 __email__   = "kadrlica@fnal.gov"
-try:
-    # Module is in the python path
-    from mkauthlist import __version__
-except ImportError:
-    # This file still lives in the source directory
-    from _version import get_versions
-    __version__ = get_versions()['version']
-except:
-    # This file is alone
-    __version__ = "UNKNOWN"
 
 import os,sys
 import csv
 from collections import OrderedDict as odict
+from collections import namedtuple
+from types import MappingProxyType
 import copy
 import re
 import logging
-
-import numpy as np
+import threading
+import argparse
+import glob
+import hashlib
+import json
+import shlex
+import time
+
+# NOTE: numpy is imported by the functions that need it rather than at
+# module level, so that '--help' and '--version' start quickly.
+
+VERSION = None
+
+def get_version():
+    """ Get the version string (resolved once, on first use).
+
+    Installed packages have the version stamped into '_version.py' by
+    versioneer at build time; only a source checkout queries git.
+    """
+    global VERSION
+    if VERSION is None:
+        try:
+            if __package__:
+                # Module is imported from the package
+                from ._version import get_versions
+            else:
+                try:
+                    # This file still lives in the source directory
+                    from _version import get_versions
+                except ImportError:
+                    # Module is in the python path
+                    from mkauthlist._version import get_versions
+            VERSION = get_versions()['version']
+        except:
+            # This file is alone
+            VERSION = "UNKNOWN"
+    return VERSION
+
+def __getattr__(name):
+    """ Resolve '__version__' and the latex templates lazily (PEP 562). """
+    if name == '__version__':
+        return get_version()
+    if name.endswith('_authlist') or name.endswith('_document'):
+        # Templates are read on first use
+        try:
+            return get_template(name)
+        except (IOError, OSError):
+            pass
+    raise AttributeError("module %r has no attribute %r"%(__name__,name))
 
 #MUNICH HACK (shouldn't be necessary any more)
 HACK = odict([
     #('Ludwig-Maximilians-Universit',r'Department of Physics, Ludwig-Maximilians-Universit\"at, Scheinerstr.\ 1, 81679 M\"unchen, Germany')
 ])
 
-def check_umlaut(lines):
-    """Check for unescaped umlaut characters in quoted strings."""
+def check_umlaut(lines, start=1, warn=None):
+    """Check for unescaped umlaut characters in quoted strings.
+
+    Lines are passed through lazily so that the check can be chained
+    with the csv reader in a single pass over the input file. Each
+    character is scanned once: outside of a quoted field we only look
+    for the opening quote, inside we look for the escaped quote,
+    umlaut, or closing quote. The quote state is carried across lines
+    (quoted fields may contain newlines) and every unescaped umlaut is
+    reported with its line and column (counting from 'start') through
+    'warn' (default: logging.warn). Lines of complete fields without an
+    umlaut in a quoted field (nearly all lines) are passed through
+    after a single pattern match.
+    """
     #This is a problem:
     #  ...,"Universit\"ats-Sternwarte, Fakult\"at f\"ur Physik"
     #While this is not:
     #  Gruen,Daniel,D.~Gr\"un,...
 
-    # The unescaped umlaut pattern: \" and not \""
-    umlaut = re.compile(r'\\"(?!")')
-    # The start of a quoted string: ,"
-    quote = re.compile(r',"')
+    # The start of a quoted field: "  or  ,"  (allowing initial spaces)
+    opening = re.compile(r'(?:^|,) *"')
+    # Inside a quoted field: escaped quote "", unescaped umlaut \" (and
+    # not \""), or the closing quote "
+    quoted = re.compile(r'(?P<escape>"")|(?P<umlaut>\\"(?!"))|(?P<close>")')
+    # A whole line of unquoted fields and closed quoted fields without
+    # an unescaped umlaut (the line ends outside of a quoted field)
+    field = r'(?:(?! *")[^,]*| *"[^"]*(?:""[^"]*)*(?<!\\)")'
+    plain = re.compile(field + '(?:,' + field + r')*(?:\r?\n)?')
+
+    if warn is None: warn = logging.warn
+
+    inquote = False
+    for lineno,line in enumerate(lines,start):
+        # Fast path: lines that cannot contain an unescaped umlaut
+        if '"' not in line or (not inquote and plain.fullmatch(line)):
+            yield line
+            continue
+        pos = 0
+        while True:
+            if not inquote:
+                match = opening.search(line,pos)
+                if match is None: break
+                inquote = True
+            else:
+                match = quoted.search(line,pos)
+                if match is None: break
+                if match.lastgroup == 'umlaut':
+                    msg = "Found unescaped umlaut (line %i, column %i): %s"%(
+                        lineno,match.start()+1,line.strip())
+                    warn(msg)
+                elif match.lastgroup == 'close':
+                    inquote = False
+            pos = match.end()
+        yield line
+
+# Modules for reading compressed csv files (by file extension)
+COMPRESSION = odict([('.gz','gzip'),('.bz2','bz2'),('.xz','lzma')])
+
+def get_compression(filename):
+    """ Get the decompression module for a file (None if uncompressed). """
+    for ext,module in COMPRESSION.items():
+        if filename.endswith(ext):
+            return module
+    return None
+
+def is_stream(filename):
+    """ The file can only be read sequentially (standard input or compressed). """
+    return filename == '-' or get_compression(filename) is not None
+
+def open_input(filename):
+    """ Open an input csv file as text.
+
+    The filename '-' reads standard input, and files ending in '.gz',
+    '.bz2', or '.xz' are decompressed as they are read (nothing is
+    decompressed to disk or held in memory).
+    """
+    if filename == '-':
+        # Don't close standard input
+        return open(sys.stdin.fileno(), closefd=False)
+    module = get_compression(filename)
+    if module is not None:
+        import importlib
+        return importlib.import_module(module).open(filename,'rt')
+    return open(filename)
+
+def read_csv(filename):
+    """ Read the PubDB csv file into a record array.
+
+    The file is streamed through the umlaut check, the csv reader, and
+    the comment filter in one pass. Only the parsed columns are held
+    in memory (not the raw lines or the list of rows).
+
+    Columns are stored as object arrays of interned strings rather than
+    fixed-width unicode. Repeated values (e.g., affiliations) share a
+    single string, and no row is padded to the longest entry.
+
+    The affiliations are also coded as integers (in order of first
+    appearance) and stored in an additional 'AffiliationID' column.
+    """
+    with open_input(filename) as infile:
+        return parse_csv(infile,filename)
+
+def parse_csv(infile, filename='<input>'):
+    """ Parse PubDB csv text into a record array (see read_csv).
+
+    Parameters:
+    infile   : iterable of text lines (e.g., an open file)
+    filename : name of the input for error messages
+
+    Returns:
+    data : author list record array
+    """
+    # Check for unescaped umlauts
+    lines = check_umlaut(infile)
+    reader = csv.reader(lines, skipinitialspace=True)
+    rows = (r for r in reader if len(r)!=0 and not r[0].startswith('#'))
+
+    names = next(rows,None)
+    if names is None:
+        raise ValueError("No header line in %s"%filename)
+    columns = [[] for n in names]
+    for row in rows:
+        if len(row) != len(names):
+            msg = "Wrong number of columns on line %i of %s"%(reader.line_num,filename)
+            raise ValueError(msg)
+        for column,value in zip(columns,row):
+            column.append(sys.intern(value))
+
+    return make_table(names,columns)
+
+def make_table(names, columns):
+    """ Build the author list record array from its string columns.
+
+    The affiliations are coded as integers (in order of first
+    appearance) and stored in an additional 'AffiliationID' column.
+
+    Parameters:
+    names   : column names
+    columns : list of the (string) values of each column
+
+    Returns:
+    data : author list record array
+    """
+    import numpy as np
+    columns = [np.array(c,dtype=object) for c in columns]
+    if 'Affiliation' in names:
+        affiliation = columns[names.index('Affiliation')]
+
+        # Hack for umlauts in affiliations...
+        for k, v in HACK.items():
+            logging.warn("Hacking '%s' ..."%k)
+            select = np.array([k in a for a in affiliation],dtype=bool)
+            affiliation[select] = v
+
+        columns.append(get_affiliation_ids(affiliation))
+        names = list(names) + ['AffiliationID']
+
+    return np.rec.fromarrays(columns,names=names)
+
+def encode_column(column):
+    """ Code the values of a column as integers (in order of first appearance).
+
+    Returns:
+    codes  : integer code of each value
+    values : list of the unique values
+    """
+    import numpy as np
+    values = dict()
+    codes = [values.setdefault(v,len(values)) for v in column]
+    return np.array(codes,dtype=np.int32), list(values)
+
+def get_affiliation_ids(affiliation):
+    """ Code the affiliations as integers (in order of first appearance). """
+    return encode_column(affiliation)[0].astype(int)
+
+def get_record_pattern(nfields, skip=False):
+    """ Regular expression matching a complete csv record.
+
+    Each field is either quoted (group 2i+1, may contain escaped quotes
+    and newlines) or unquoted (group 2i+2, quotes after the first
+    character are literal, as for the csv reader), after optional
+    initial spaces. Anything else (e.g., text after a closing quote)
+    does not match.
+
+    With 'skip', the pattern matches any number of complete records
+    (each terminated by a newline) without capturing the fields.
+    """
+    if skip:
+        field = rb' *(?:"[^"]*(?:""[^"]*)*"|(?:[^ ,"\r\n][^,\r\n]*)?)'
+        return re.compile(rb'(?:' + rb','.join([field]*nfields) + rb'\r?\n)*')
+    field = rb' *(?:"([^"]*(?:""[^"]*)*)"|((?:[^ ,"\r\n][^,\r\n]*)?))'
+    return re.compile(rb','.join([field]*nfields) + rb'(?:\r?\n|\Z)')
+
+# Line endings of a csv file (translated to '\n' as in text mode)
+NEWLINE = re.compile(rb'\r\n?|\n')
+
+def read_record(buf, pos, lineno=1, warn=None):
+    """ Parse one record of a mapped csv file with the csv reader.
+
+    Parameters:
+    buf    : memory mapped csv file
+    pos    : start of the record
+    lineno : line number at the start of the record
+    warn   : function to report unescaped umlauts (see check_umlaut)
+
+    Returns:
+    row    : list of field values ([] for a blank line)
+    end    : end of the record
+    lineno : line number of the last line of the record
+    """
+    size = len(buf)
+    end = [pos]
+    def lines():
+        while end[0] < size:
+            # Universal newlines, as for the text file read by read_csv
+            newline = NEWLINE.search(buf,end[0])
+            if newline is None:
+                line = buf[end[0]:size].decode('utf-8')
+                end[0] = size
+            else:
+                line = buf[end[0]:newline.start()].decode('utf-8') + '\n'
+                end[0] = newline.end()
+            yield line
+    lines = check_umlaut(lines(),lineno,warn)
+    reader = csv.reader(lines, skipinitialspace=True)
+    row = next(reader,[])
+    return row, end[0], lineno + reader.line_num - 1
+
+def read_records(buf, start, end, names, select, lineno=1, filename=None,
+                 warn=None):
+    """ Parse the csv records in a range of a memory mapped file.
+
+    Each record is matched in place against the mapped file, so fields
+    are only located by their offsets and only the selected columns are
+    decoded. Records that are not plain csv (e.g., comments, blank
+    lines, or unescaped umlauts in quoted fields) fall back to the
+    umlaut check and the csv reader.
+
+    Parameters:
+    buf      : memory mapped csv file
+    start    : start of the first record
+    end      : end of the last record
+    names    : names of all columns
+    select   : names of the columns to decode
+    lineno   : line number at start
+    filename : name of the csv file (for error messages)
+    warn     : function to report unescaped umlauts (see check_umlaut)
+
+    Returns:
+    values   : list of the values of each selected column
+    affkeys  : unique raw affiliations (if 'Affiliation' is not selected)
+    affcodes : index of the raw affiliation of each record in affkeys
+    """
+    index = [names.index(n) for n in select]
+    rawidx = names.index('Affiliation') if 'Affiliation' not in select \
+             and 'Affiliation' in names else None
+
+    # Line numbers are only counted when they are needed
+    counted = [start,lineno]
+    def get_lineno(pos):
+        last,lineno = counted
+        counted[:] = [pos,lineno + buf[last:pos].count(b'\n')]
+        return counted[1]
+
+    values = [[] for n in select]
+    # Affiliation codes from the raw bytes (only the unique values are kept)
+    affids, affcodes = dict(), []
+    record = get_record_pattern(len(names))
+    pos = start
+    while pos < end:
+        match = record.match(buf,pos)
+        if match is None:
+            row,pos,lineno = read_record(buf,pos,get_lineno(pos),warn)
+            if len(row) == 0 or row[0].startswith('#'):
+                continue
+            if len(row) != len(names):
+                msg = "Wrong number of columns on line %i of %s"%(lineno,filename)
+                raise ValueError(msg)
+            for column,i in zip(values,index):
+                column.append(sys.intern(row[i]))
+            if rawidx is not None:
+                key = row[rawidx].encode('utf-8')
+                affcodes.append(affids.setdefault(key,len(affids)))
+            continue
+
+        pos = match.end()
+        first = match.start(1) if match.start(1) >= 0 else match.start(2)
+        if buf[first:first+1] == b'#':
+            continue
+
+        for column,i in zip(values,index):
+            if match.start(2*i+1) >= 0:
+                value = buf[match.start(2*i+1):match.end(2*i+1)].decode('utf-8')
+                value = value.replace('""','"').replace('\r\n','\n').replace('\r','\n')
+            else:
+                value = buf[match.start(2*i+2):match.end(2*i+2)].decode('utf-8')
+            column.append(sys.intern(value))
+        if rawidx is not None:
+            if match.start(2*rawidx+1) >= 0:
+                key = buf[match.start(2*rawidx+1):match.end(2*rawidx+1)]
+                key = key.replace(b'""',b'"').replace(b'\r\n',b'\n').replace(b'\r',b'\n')
+            else:
+                key = buf[match.start(2*rawidx+2):match.end(2*rawidx+2)]
+            affcodes.append(affids.setdefault(key,len(affids)))
+
+    return values, list(affids), affcodes
+
+def get_chunks(buf, start, nfields, nchunks):
+    """ Split the records of a mapped csv file into byte ranges.
+
+    The records are skipped (without capturing any fields) up to each
+    split point, so the ranges always start at a record boundary, even
+    with quoted newlines. Irregular records are skipped with the csv
+    reader.
+
+    Parameters:
+    buf     : memory mapped csv file
+    start   : start of the first record
+    nfields : number of fields of each record
+    nchunks : number of ranges
+
+    Returns:
+    chunks : list of (start, end, lineno) of each range (lineno is
+             counted from the start of the first range)
+    """
+    size = len(buf)
+    record = get_record_pattern(nfields)
+    skip = get_record_pattern(nfields, skip=True)
+
+    bounds = [start]
+    pos = start
+    for i in range(1,nchunks):
+        target = start + (size-start)*i//nchunks
+        while pos < target:
+            # Complete records before the target
+            pos = skip.match(buf,pos,target).end()
+            if pos >= target: break
+            # A record across the target (or an irregular record)
+            match = record.match(buf,pos)
+            if match is not None:
+                pos = match.end()
+            else:
+                pos = read_record(buf,pos,warn=lambda msg: None)[1]
+        if pos >= size: break
+        bounds.append(pos)
+    bounds.append(size)
+
+    chunks = []
+    lineno = 0
+    for first,last in zip(bounds[:-1],bounds[1:]):
+        chunks.append((first,last,lineno))
+        lineno += buf[first:last].count(b'\n')
+    return chunks
+
+def read_chunk(filename, start, end, names, select, lineno=1):
+    """ Parse a range of a csv file in a worker process.
+
+    Returns:
+    warnings : unescaped umlauts found in the range (see check_umlaut)
+    result   : output of read_records (or the error raised)
+    """
+    import mmap
+    warnings = []
+    with open(filename,'rb') as f:
+        buf = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+    try:
+        result = read_records(buf, start, end, names, select, lineno,
+                              filename, warn=warnings.append)
+    except ValueError as e:
+        result = e
+    finally:
+        buf.close()
+    return warnings, result
+
+# Minimum size (in bytes) of the chunks of a csv file parsed in parallel
+CHUNK_SIZE = 2**22
+
+def read_csv_mmap(filename, columns=None, jobs=1, chunksize=CHUNK_SIZE):
+    """ Read the PubDB csv file through a memory map.
+
+    Strings are created only for the requested columns; the other
+    columns are not decoded and are left out of the returned table.
+    The 'AffiliationID' column is always created (from the raw bytes
+    if the 'Affiliation' text is not requested). The result is the
+    same as for read_csv (see read_records).
+
+    With jobs > 1, large files are split into record-aligned chunks
+    (see get_chunks) that are parsed by a pool of worker processes and
+    concatenated in order. Warnings and errors are reported in the
+    order of the file.
+
+    Parameters:
+    filename  : input csv file
+    columns   : names of the columns to create (default: all)
+    jobs      : number of parallel parsing processes
+    chunksize : minimum size of the chunks parsed in parallel
+
+    Returns:
+    data : author list record array
+    """
+    import mmap
+    import numpy as np
+
+    with open(filename,'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Empty file: %s"%filename)
+        buf = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+
+    try:
+        # Header (skipping blank lines and comments)
+        size, pos, lineno = len(buf), 0, 0
+        while pos < size:
+            names,pos,lineno = read_record(buf,pos,lineno+1)
+            if len(names) != 0 and not names[0].startswith('#'):
+                break
+        else:
+            raise ValueError("No header found in %s"%filename)
+        lineno += 1
+
+        if columns is None:
+            columns = names
+        select = [n for n in names if n in columns]
+        if HACK and 'Affiliation' in names and 'Affiliation' not in select:
+            select.append('Affiliation')
+
+        nchunks = min(jobs,(size-pos)//max(chunksize,1))
+        if nchunks > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            chunks = get_chunks(buf,pos,len(names),nchunks)
+            results = []
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(read_chunk,filename,start,end,names,
+                                           select,lineno+offset)
+                           for start,end,offset in chunks]
+                for future in futures:
+                    warnings,result = future.result()
+                    for msg in warnings:
+                        logging.warn(msg)
+                    if isinstance(result,Exception):
+                        raise result
+                    results.append(result)
+        else:
+            results = [read_records(buf,pos,size,names,select,lineno,filename)]
+    finally:
+        buf.close()
+
+    # Concatenate the chunks in order
+    values = [[] for n in select]
+    affids, affcodes = dict(), []
+    for chunk,affkeys,codes in results:
+        for column,v in zip(values,chunk):
+            column.extend(map(sys.intern,v) if len(results) > 1 else v)
+        remap = [affids.setdefault(k,len(affids)) for k in affkeys]
+        affcodes.extend(remap[c] for c in codes)
+
+    if 'Affiliation' in select or 'Affiliation' not in names:
+        return make_table(select,values)
+
+    values = [np.array(c,dtype=object) for c in values]
+    values.append(np.array(affcodes,dtype=int))
+    return np.rec.fromarrays(values,names=select+['AffiliationID'])
+
+def get_file_hash(filename):
+    """ SHA1 hex digest of the content of a file. """
+    sha = hashlib.sha1()
+    with open(filename,'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+# Version of the binary table cache format
+TABLE_CACHE_FORMAT = 1
+
+def get_table_cache(filename):
+    """ Name of the binary table cache next to a csv file. """
+    return filename + '.npz'
+
+def write_table_cache(filename, data):
+    """ Write a binary (npz) sidecar cache of a parsed author list.
+
+    Each string column is stored as integer codes into its unique
+    values, so the cache is compact and is loaded without any csv
+    parsing. The size, modification time, and hash of the csv file are
+    stored to validate the cache.
+
+    Parameters:
+    filename : input csv file
+    data     : author list record array read from the csv file
+
+    Returns:
+    cachefile : name of the cache file
+    """
+    import numpy as np
+    stat = os.stat(filename)
+    arrays = dict(format=np.array(TABLE_CACHE_FORMAT),
+                  stat=np.array([stat.st_size,stat.st_mtime_ns],dtype=np.int64),
+                  sha1=np.array(get_file_hash(filename)),
+                  names=np.array(data.dtype.names))
+
+    for i,name in enumerate(data.dtype.names):
+        column = data[name]
+        if column.dtype == object:
+            codes,values = encode_column(column)
+            arrays['codes_%i'%i] = codes
+            arrays['values_%i'%i] = np.array(values,dtype=str)
+        else:
+            arrays['column_%i'%i] = column
+
+    cachefile = get_table_cache(filename)
+    tmpname = cachefile + '.%i.tmp'%os.getpid()
+    with open(tmpname,'wb') as f:
+        np.savez(f,**arrays)
+    os.rename(tmpname,cachefile)
+    return cachefile
+
+def read_table_cache(filename):
+    """ Read the binary sidecar cache of a csv file.
+
+    The cache is valid if the size and modification time of the csv
+    file are unchanged (or, if only the modification time changed, the
+    content hash is unchanged). Note that the csv checks (e.g., for
+    unescaped umlauts) are not repeated for a cached table.
+
+    Parameters:
+    filename : input csv file
+
+    Returns:
+    data : author list record array (None if there is no valid cache)
+    """
+    import numpy as np
+    cachefile = get_table_cache(filename)
+    if not os.path.exists(cachefile):
+        return None
+
+    try:
+        with np.load(cachefile) as npz:
+            if int(npz['format']) != TABLE_CACHE_FORMAT:
+                return None
+            stat = os.stat(filename)
+            size,mtime = npz['stat']
+            if size != stat.st_size:
+                return None
+            if mtime != stat.st_mtime_ns:
+                if str(npz['sha1']) != get_file_hash(filename):
+                    return None
+
+            names = [str(n) for n in npz['names']]
+            columns = []
+            for i,name in enumerate(names):
+                if 'codes_%i'%i in npz.files:
+                    values = npz['values_%i'%i].astype(object)
+                    columns.append(values[npz['codes_%i'%i]])
+                else:
+                    columns.append(npz['column_%i'%i])
+    except (IOError, ValueError, KeyError) as e:
+        logging.warn("Could not read %s: %s"%(cachefile,e))
+        return None
+
+    logging.debug("Loaded cached table: %s"%cachefile)
+    return np.rec.fromarrays(columns,names=names)
+
+# Columnar file formats (by file extension)
+TABLE_FORMATS = odict([('.parquet','parquet'),('.pq','parquet'),
+                       ('.feather','feather'),('.arrow','feather')])
+
+def get_table_format(filename):
+    """ Get the columnar format of a file (None for csv). """
+    return TABLE_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+def import_pyarrow():
+    """ Import pyarrow (only needed for Arrow/Parquet files). """
+    try:
+        import pyarrow
+    except ImportError:
+        msg = "Arrow/Parquet files require pyarrow (pip install pyarrow)"
+        raise ImportError(msg)
+    return pyarrow
+
+def to_arrow(data):
+    """ Convert an author list to an Arrow table.
+
+    The string columns are dictionary encoded, so each unique string is
+    stored once and the integer codes are handed to Arrow without a
+    copy. Use 'table.to_pandas()' for a pandas DataFrame (the string
+    columns become categoricals).
+
+    Parameters:
+    data : author list record array
+
+    Returns:
+    table : pyarrow.Table
+    """
+    pa = import_pyarrow()
+    arrays = []
+    for name in data.dtype.names:
+        column = data[name]
+        if column.dtype == object:
+            codes,values = encode_column(column)
+            values = pa.array(values,type=pa.string())
+            arrays.append(pa.DictionaryArray.from_arrays(codes,values))
+        else:
+            arrays.append(pa.array(column))
+    return pa.table(arrays,names=list(data.dtype.names))
+
+def from_arrow(table):
+    """ Convert an Arrow table (e.g., from pyarrow or pandas) to an author list.
+
+    Plain and dictionary encoded columns are accepted. Missing values
+    become empty strings and other types are converted to strings, as
+    if they were read from a csv file. The 'AffiliationID' column is
+    always rebuilt from the 'Affiliation' column.
+
+    Parameters:
+    table : pyarrow.Table
+
+    Returns:
+    data : author list record array
+    """
+    pa = import_pyarrow()
+    import numpy as np
+
+    def to_string(value):
+        if value is None: return ''
+        return sys.intern(value if isinstance(value,str) else str(value))
+
+    names, columns = [], []
+    for name in table.column_names:
+        if name == 'AffiliationID': continue
+        column = table.column(name).combine_chunks()
+        if pa.types.is_dictionary(column.type):
+            # Convert each unique value once
+            values = [to_string(v) for v in column.dictionary.to_pylist()]
+            values = np.array(values + [''],dtype=object)
+            codes = column.indices.fill_null(len(values)-1)
+            column = values[codes.to_numpy(zero_copy_only=False)]
+        else:
+            column = [to_string(v) for v in column.to_pylist()]
+        names.append(name)
+        columns.append(column)
+
+    return make_table(names,columns)
+
+def read_table(filename):
+    """ Read an author list from a Parquet or Arrow IPC (Feather) file. """
+    import_pyarrow()
+    if get_table_format(filename) == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(filename)
+    else:
+        import pyarrow.feather as feather
+        table = feather.read_table(filename)
+    return from_arrow(table)
+
+def write_table(filename, data):
+    """ Write an author list to a Parquet or Arrow IPC (Feather) file. """
+    table = to_arrow(data)
+    if get_table_format(filename) == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table,filename)
+    elif get_table_format(filename) == 'feather':
+        import pyarrow.feather as feather
+        feather.write_feather(table,filename)
+    else:
+        msg = "Unrecognized table format: %s"%filename
+        raise ValueError(msg)
+
+class Affiliation(object):
+    """ An affiliation shared by the authors of a list.
 
-    for line in lines:
-        if umlaut.search(line) is None or quote.search(line) is None: continue
-        if umlaut.search(line).start() > quote.search(line).start():
-            msg =  "Found unescaped umlaut: " + line.strip()
-            logging.warn(msg)
-    return lines
+    Affiliations are equal if their names are equal.
+    """
+    __slots__ = ('name','code')
+
+    def __init__(self, name, code=None):
+        self.name = name
+        self.code = code
+
+    def __eq__(self, other):
+        return isinstance(other,Affiliation) and self.name == other.name
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return "Affiliation(%r)"%self.name
+
+class Author(object):
+    """ One row of an author list: an author and one of their affiliations.
+
+    Authors with several affiliations have one record per affiliation
+    (in the order of the author list). Missing columns are None.
+    """
+    __slots__ = ('lastname','firstname','authorname','affiliation',
+                 'orcid','email','contribution')
+
+    def __init__(self, lastname, firstname, authorname, affiliation,
+                 orcid=None, email=None, contribution=None):
+        self.lastname = lastname
+        self.firstname = firstname
+        self.authorname = authorname
+        self.affiliation = affiliation
+        self.orcid = orcid
+        self.email = email
+        self.contribution = contribution
+
+    def __repr__(self):
+        return "Author(%r, %r)"%(self.authorname,self.affiliation.name)
+
+# Author attributes and the corresponding table columns
+AUTHOR_COLUMNS = odict([('lastname','Lastname'),('firstname','Firstname'),
+                        ('authorname','Authorname'),('orcid','ORCID'),
+                        ('email','Email'),('contribution','Contribution')])
+
+def get_authors(data):
+    """ Get the author records of an (ordered) author list.
+
+    The records are built column by column, and authors with the same
+    affiliation share a single Affiliation object. A list of Author
+    records is returned unchanged.
+
+    Parameters:
+    data : author list record array (or list of Author records)
+
+    Returns:
+    authors : list of Author records
+    """
+    if isinstance(data,list):
+        return data
+
+    names = data.dtype.names
+    columns = [data[c].tolist() if c in names else [None]*len(data)
+               for c in AUTHOR_COLUMNS.values()]
+
+    if 'Affiliation' in names:
+        affnames = data['Affiliation'].tolist()
+    else:
+        affnames = [None]*len(data)
+    if 'AffiliationID' in names:
+        codes = data['AffiliationID'].tolist()
+    else:
+        # Code the affiliations by name
+        codes = get_affiliation_ids(affnames).tolist()
+    affiliations = dict()
+    for code,name in zip(codes,affnames):
+        if code not in affiliations:
+            affiliations[code] = Affiliation(name,code)
+
+    authors = []
+    for code,(last,first,name,orcid,email,cntrb) in zip(codes,zip(*columns)):
+        authors.append(Author(last,first,name,affiliations[code],orcid,email,cntrb))
+    return authors
+
+def get_affiliations(authors):
+    """ Number the affiliations in order of first appearance.
+
+    Affiliations are identified by their integer code (the
+    'AffiliationID'), or by their name if they have no code.
+
+    Parameters:
+    authors : list of Author records
+
+    Returns:
+    affidx       : affiliation index of each author record
+    affiliations : list of affiliation strings (in index order)
+    """
+    index, affiliations = dict(), []
+    affidx = []
+    for a in authors:
+        aff = a.affiliation
+        key = aff.name if aff.code is None else aff.code
+        idx = index.get(key)
+        if idx is None:
+            idx = index[key] = len(affiliations)
+            affiliations.append(aff.name)
+        affidx.append(idx)
+    return affidx, affiliations
+
+def char_lower(values):
+    """ Vectorized str.lower for the (object) string columns. """
+    import numpy as np
+    return np.frompyfunc(str.lower,1,1)(values)
+
+def char_upper(values):
+    """ Vectorized str.upper for the (object) string columns. """
+    import numpy as np
+    return np.frompyfunc(str.upper,1,1)(values)
 
 def get_builders(data):
     """ Get a boolean array of the authors that are builders. """
     if 'AuthorType' in data.dtype.names:
-        builders = (np.char.lower(data['AuthorType']) == 'builder')
+        builders = (char_lower(data['AuthorType']) == 'builder').astype(bool)
     elif 'JoinedAsBuilder' in data.dtype.names:
-        builders = (np.char.lower(data['JoinedAsBuilder']) == 'true')
+        builders = (char_lower(data['JoinedAsBuilder']) == 'true').astype(bool)
     else:
         msg = "No builder column found."
         raise ValueError(msg)
 
     return builders
 
-def write_contributions(filename,data):
-    """ Write a file of author contributions. """
+def read_aux(filename):
+    """ Read the auxiliary author ordering file (one name per line). """
+    auxcols = ['Lastname','Firstname']
+    aux = []
+    with open(filename) as auxfile:
+        for r in csv.DictReader(auxfile, fieldnames=auxcols):
+            if not r[auxcols[0]].startswith('#'):
+                aux.append(tuple(r[c] or '' for c in auxcols))
+
+    if len(set(aux)) != len(aux):
+        logging.error('Non-unique names in aux file.')
+        print(open(filename).read())
+        raise Exception()
+
+    return aux
+
+def get_aux_order(data,aux):
+    """ Get the permutation that moves the auxiliary authors to the front.
+
+    The (Lastname, Firstname) index of the author list is built once, so
+    each auxiliary name is a dictionary lookup rather than a comparison
+    against every row. The remaining authors keep their order.
+
+    Parameters:
+    data : author list record array
+    aux  : list of (lastname, firstname) tuples (firstname may be '')
+
+    Returns:
+    order : index array to reorder the author list
+    """
+    import numpy as np
+    lastnames, fullnames = dict(), dict()
+    for i,(last,first) in enumerate(zip(data['Lastname'],data['Firstname'])):
+        lastnames.setdefault(last,[]).append(i)
+        fullnames.setdefault((last,first),[]).append(i)
+
+    used = np.zeros(len(data),dtype=bool)
+    order = []
+    for lastname,firstname in aux:
+        lastname = lastname.strip()
+        if firstname:
+            firstname = firstname.strip()
+            match = fullnames.get((lastname,firstname),[])
+        else:
+            match = lastnames.get(lastname,[])
+        # Authors that have already been ordered are not matched again
+        match = [i for i in match if not used[i]]
+
+        # Check that match found
+        if len(match) < 1:
+            msg = "Auxiliary name not found: %s"%(lastname)
+            if firstname: msg += ', %s'%firstname
+            logging.warn(msg)
+            continue
+
+        # Check unique firstname
+        if not len(set(data['Firstname'][match])) == 1:
+            msg = "Non-unique name: %s"%(lastname)
+            if firstname: msg += ', %s'%firstname
+            logging.error(msg)
+            raise ValueError(msg)
+
+        used[match] = True
+        order += match
+
+    return np.concatenate([np.array(order,dtype=int),np.nonzero(~used)[0]])
+
+def get_order(data, sort=False, sort_builder=False, sort_nonbuilder=False, aux=None):
+    """ Get the index permutation that orders the author list.
+
+    The ordering stages (non-builder/builder tiers, tier sorting, global
+    sorting, and auxiliary ordering) are composed as index arrays, so the
+    author list itself only needs to be gathered once (``data[order]``).
+
+    Parameters:
+    data            : author list record array
+    sort            : alphabetize the entire author list
+    sort_builder    : alphabetize the builders
+    sort_nonbuilder : alphabetize the non-builders
+    aux             : list of (lastname, firstname) to place first
+
+    Returns:
+    order : index array to reorder the author list
+    """
+    import numpy as np
+    isbuilder  = get_builders(data)
+    builder    = np.nonzero(isbuilder)[0]
+    nonbuilder = np.nonzero(~isbuilder)[0]
+
+    if sort or sort_builder or sort_nonbuilder:
+        firstname = char_upper(data['Firstname'])
+        lastname  = char_upper(data['Lastname'])
+
+    if sort_builder:
+        idx = np.lexsort((firstname[builder],lastname[builder]))
+        builder = builder[idx]
+
+    if sort_nonbuilder:
+        idx = np.lexsort((firstname[nonbuilder],lastname[nonbuilder]))
+        nonbuilder = nonbuilder[idx]
+
+    order = np.concatenate([nonbuilder,builder])
+
+    if sort:
+        idx = np.lexsort((firstname[order],lastname[order]))
+        order = order[idx]
+
+    if aux is not None:
+        # Only the name columns are needed to match the auxiliary authors
+        names = ['Lastname','Firstname']
+        names = np.rec.fromarrays([data[n][order] for n in names],names=names)
+        order = order[get_aux_order(names,aux)]
+
+    return order
+
+def get_cntrbdict(data):
+    """ Get the contribution of each (unique) author name. """
     logging.info("Creating contribution list...")
-    if 'Contribution' not in data.dtype.names:
+    authors = get_authors(data)
+    if any(d.contribution is None for d in authors):
         logging.error("No 'Contribution' field.")
         raise Exception()
 
     cntrbdict = odict()
-    for i,d in enumerate(data):
-        if cntrbdict.get(d['Authorname'],d['Contribution']) != d['Contribution']:
-            logging.warn("Non-unique contribution for '%(Authorname)s'"%d)
+    for d in authors:
+        if cntrbdict.get(d.authorname,d.contribution) != d.contribution:
+            logging.warn("Non-unique contribution for '%s'"%d.authorname)
+
+        cntrbdict[d.authorname]=d.contribution
+
+    return cntrbdict
 
-        cntrbdict[d['Authorname']]=d['Contribution']
+def iter_contributions(cntrbdict):
+    """ Yield the lines of the author contributions.
 
-    output = r'Author contributions are listed below. \\'+'\n'
-    for i,(name,cntrb) in enumerate(cntrbdict.items()):
+    Parameters:
+    cntrbdict : ordered dictionary of {authorname: contribution}
+
+    Returns:
+    lines : generator of output lines
+    """
+    yield r'Author contributions are listed below. \\'+'\n'
+    for name,cntrb in cntrbdict.items():
         if cntrb == '':
             logging.warn("Blank contribution for '%s'"%name)
 
-        output += r'%s: %s \\'%(name,cntrb) + '\n'
+        yield r'%s: %s \\'%(name,cntrb) + '\n'
+
+def get_contributions(data):
+    """ Get the text of the author contributions. """
+    return ''.join(iter_contributions(get_cntrbdict(data)))
+
+def write_contributions(filename,data):
+    """ Write a file of author contributions. """
+    lines = iter_contributions(get_cntrbdict(data))
 
     logging.info('Writing contribution file: %s'%filename)
 
-    out = open(filename,'w')
-    out.write(output)
-    out.close()
+    with open(filename,'w') as out:
+        write_fragments(out,lines)
 
 
 journal2class = odict([
@@ -111,6 +1055,7 @@ journal2class = odict([
     ('prd','revtex'),
     ('aastex','aastex6'),     # This is for aastex v6.*
     ('aastex5','aastex'),     # This is for aastex v5.*
+    ('aastex6','aastex6'),
     ('aastex61','aastex6'),   # This is for aastex v6.1
     ('aastex7','aastex7'),   # This is for aastex v7.*
     ('apj','aastex6'),
@@ -123,236 +1068,826 @@ journal2class = odict([
     ('aanda', 'aanda')
 ])
 
-defaults = dict(
+# Read-only: per-call values are set in the RenderConfig
+defaults = MappingProxyType(dict(
     title = "Publication Title",
-    abstract=r"This is a sample document created by \texttt{%s v%s}."%(os.path.basename(__file__),__version__),
+    abstract=r"This is a sample document created by \texttt{%(prog)s v%(version)s}.",
     collaboration="DES Collaboration"
-)
+))
+
+class RenderConfig(namedtuple('RenderConfig',['journal','doc','orcid','idx','sort',
+                                              'collaboration','title','abstract'],
+                              defaults=['apj',False,False,1,False,
+                                        defaults['collaboration'],
+                                        defaults['title'],defaults['abstract']])):
+    """ Immutable options of one rendering call.
+
+    All options are passed explicitly with each call (nothing is read
+    from or written to module state), so one config can be shared by
+    any number of threads. Use '_replace' to derive a new config.
+
+    Fields:
+    journal       : journal name or latex document class (see journal2class)
+    doc           : create standalone latex document
+    orcid         : include ORCID information (revtex and aastex)
+    idx           : starting affiliation index
+    sort          : the author list is alphabetized (arxiv format)
+    collaboration : collaboration name
+    title         : title of the standalone document
+    abstract      : abstract of the standalone document
+    """
+    __slots__ = ()
+
+def get_config(config=None, **kwargs):
+    """ Build a RenderConfig from keyword options.
+
+    Options that are None keep their value in 'config' (or the default
+    value if no config is given).
+    """
+    if config is None:
+        config = RenderConfig()
+    kwargs = dict((k,v) for k,v in kwargs.items() if v is not None)
+    return config._replace(**kwargs)
+
+### RENDERERS ###
+# Renderer class for each latex document class (see register_renderer)
+renderers = odict()
+
+# Entry point group for third-party renderers
+ENTRY_POINT_GROUP = 'mkauthlist.renderers'
+_entry_points_loaded = False
+
+# Templates that have been read (see get_template)
+_templates = dict()
+
+# Guards the lazy loading of templates and entry points
+_lock = threading.RLock()
+
+def get_template(name):
+    """ Read a latex template on first use.
+
+    Templates are the files 'templates/<name>.tex' next to this module
+    (e.g., 'mnras_authlist' or 'mnras_document').
+    """
+    template = _templates.get(name)
+    if template is not None:
+        return template
+    with _lock:
+        if name in _templates:
+            return _templates[name]
+        path = os.path.dirname(os.path.realpath(__file__))
+        filename = os.path.join(path,'templates',name+'.tex')
+        if os.path.exists(filename):
+            with open(filename) as f:
+                _templates[name] = f.read()
+        else:
+            # Installed script: read from the installed package
+            import pkgutil
+            data = pkgutil.get_data('mkauthlist','templates/%s.tex'%name)
+            _templates[name] = data.decode('utf-8')
+    return _templates[name]
+
+def iter_template(template, params):
+    """ Yield the fragments of a %-formatted template.
+
+    Parameters that are not strings (e.g., generators of the author
+    entries) are yielded fragment by fragment instead of being joined
+    into one string.
+
+    Parameters:
+    template : template with '%(name)s' fields
+    params   : dictionary of parameters
+
+    Returns:
+    fragments : generator of output strings
+    """
+    pos = 0
+    for match in re.finditer(r'%(?:%|\((\w+)\)s)',template):
+        name = match.group(1)
+        if name is None or isinstance(params[name],str): continue
+        yield template[pos:match.start()]%params
+        for fragment in params[name]:
+            yield fragment
+        pos = match.end()
+    yield template[pos:]%params
+
+def iter_join(sep, fragments):
+    """ Yield the fragments separated by 'sep' (a lazy sep.join). """
+    for i,fragment in enumerate(fragments):
+        if i: yield sep
+        yield fragment
+
+def write_fragments(stream, fragments, bufsize=2**16):
+    """ Write fragments of text to a stream.
+
+    Fragments are collected into blocks of about 'bufsize' characters,
+    so that the output is written in a few large writes while only one
+    block is held in memory.
+
+    Parameters:
+    stream    : file-like object
+    fragments : iterable of strings
+    bufsize   : size of the write blocks (characters)
+
+    Returns:
+    None
+    """
+    block, size = [], 0
+    for fragment in fragments:
+        block.append(fragment)
+        size += len(fragment)
+        if size >= bufsize:
+            stream.write(''.join(block))
+            block, size = [], 0
+    if block:
+        stream.write(''.join(block))
+
+def register_renderer(cls):
+    """ Register a renderer class (can be used as a class decorator).
+
+    The renderer is registered for its document class ('cls.name') and
+    for each of its journal names ('cls.journals') that is not already
+    taken.
+    """
+    with _lock:
+        renderers[cls.name] = cls
+        for journal in (cls.journals or [cls.name]):
+            journal2class.setdefault(journal.lower(),cls.name)
+    return cls
+
+def load_entry_points():
+    """ Register the renderers of installed packages (only done once).
+
+    Packages declare renderer classes in the 'mkauthlist.renderers'
+    entry point group, e.g., in setup.py:
+        entry_points={'mkauthlist.renderers': ['mydoc = mypkg:MyRenderer']}
+    """
+    global _entry_points_loaded
+    if _entry_points_loaded: return
+    with _lock:
+        if _entry_points_loaded: return
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:
+            entry_points = None
+        if entry_points is not None:
+            try:
+                eps = entry_points(group=ENTRY_POINT_GROUP)
+            except TypeError:
+                # Python < 3.10
+                eps = entry_points().get(ENTRY_POINT_GROUP,[])
+            for ep in eps:
+                try:
+                    register_renderer(ep.load())
+                except Exception as e:
+                    logging.warn("Could not load renderer '%s': %s"%(ep.name,e))
+        # Only set once all renderers are registered
+        _entry_points_loaded = True
+
+def get_renderer(journal):
+    """ Get the renderer class for a journal name or document class. """
+    journal = journal.lower()
+    if journal not in journal2class:
+        load_entry_points()
+    if journal not in journal2class:
+        msg = "Unrecognized journal: %s"%journal
+        raise ValueError(msg)
+    cls = journal2class[journal]
+    if cls not in renderers:
+        msg = "Unrecognized latex class: %s"%cls
+        raise ValueError(msg)
+    return renderers[cls]
+
+class Renderer(object):
+    """ Base class for rendering an author list for a latex document class.
+
+    Subclasses set the document class 'name' (and optionally the
+    journal names it is used for) and implement 'get_params', which
+    returns the template parameters ('authors', 'affiliations', ...).
+    The templates ('<name>_authlist' and '<name>_document' by default)
+    are read on first use.
+    """
+    # Latex document class
+    name = None
+    # Journal names for this document class (default: [name])
+    journals = []
+    # Templates (default: '<name>_authlist' and '<name>_document')
+    authlist = None
+    document = None
+    # Csv columns needed for rendering (see get_columns)
+    columns = ['Affiliation']
+    # Format of a numbered affiliation (see format_affiliation)
+    affiltext = None
+
+    def __init__(self, config=None, state=None):
+        if config is None:
+            config = RenderConfig(journal=self.name)
+        self.config = config
+        self.orcid = config.orcid
+        self.idx = config.idx
+        self.sort = config.sort
+        # Fragments of the previous run (see get_fragment)
+        self.state = state
+        self.previous = dict(state) if state is not None else dict()
+        if state is not None:
+            state.clear()
+
+    def get_authlist(self):
+        """ Get the author list template. """
+        return get_template(self.authlist or self.name+'_authlist')
+
+    def get_document(self):
+        """ Get the standalone document template. """
+        return get_template(self.document or self.name+'_document')
+
+    def get_params(self, authors):
+        """ Get the template parameters for a list of Author records.
+
+        Long parameters ('authors', 'affiliations') can be generators
+        of fragments (see iter_template).
+        """
+        raise NotImplementedError()
+
+    def get_fragment(self, key, args, func):
+        """ Render one entry of the author list.
+
+        With a state dictionary, the fragment of the previous run is
+        reused if the entry was rendered from the same arguments, and
+        the fragment is recorded in the (new) state.
+
+        Parameters:
+        key  : name of the entry (e.g., 'author:<authorname>')
+        args : tuple of strings and numbers that determine the entry
+        func : function rendering the entry from the args
+
+        Returns:
+        fragment : rendered entry
+        """
+        if self.state is None:
+            return func(*args)
+
+        digest = hashlib.sha1(repr((self.name,)+args).encode('utf-8')).hexdigest()
+        previous = self.previous.get(key)
+        if previous is not None and previous[0] == digest:
+            fragment = previous[1]
+        else:
+            logging.debug("Rendering %s"%key)
+            fragment = func(*args)
+        self.state[key] = [digest,fragment]
+        return fragment
+
+    def iter_affiltexts(self, affiliations):
+        """ Yield the numbered affiliations. """
+        for v,k in enumerate(affiliations):
+            yield self.get_fragment('affiliation:%i'%v,(v+self.idx,k),
+                                    self.format_affiliation)
+
+    def format_affiliation(self, idx, name):
+        """ Format one affiliation ('idx' is its number). """
+        return self.affiltext%(idx,name)
+
+    def iter_render(self, authors):
+        """ Yield the fragments of the author list (or document). """
+        config = self.config
+        params = dict(title=config.title, abstract=config.abstract,
+                      collaboration=config.collaboration)
+        params.update(self.get_params(authors))
+
+        authlist = self.get_authlist()
+        if config.doc:
+            if config.abstract == defaults['abstract']:
+                # Only the default abstract is a format string
+                params['abstract'] %= dict(prog=os.path.basename(__file__),
+                                           version=get_version())
+            params['authlist'] = iter_template(authlist,params)
+            return iter_template(self.get_document(),params)
+        return iter_template(authlist,params)
+
+    def render(self, authors):
+        """ Render the author list (or a standalone document). """
+        return ''.join(self.iter_render(authors))
+
+def check_author(d, affiliation=True):
+    """ Warn about blank author (and affiliation) names. """
+    if affiliation and d.affiliation.name == '':
+        logging.warn("Blank affiliation for '%s'"%d.authorname)
+    if d.authorname == '':
+        logging.warn("Blank authorname for '%s %s'"%(d.firstname,
+                                                     d.lastname))
 
 ### REVTEX ###
-revtex_authlist = r"""
-%(authors)s
-
-\collaboration{%(collaboration)s}
-"""
-
-revtex_document = r"""
-\documentclass[reprint,superscriptaddress]{revtex4-1}
-\pagestyle{empty}
-\begin{document}
-\title{%(title)s}
-
-%(authlist)s
-
-\begin{abstract}
-%(abstract)s
-\end{abstract}
-\maketitle
-\end{document}
-"""
-
-### AASTEX ###
-aastex_authlist = r"""
-\def\andname{}
-
-\author{
-%(authors)s
-\\ \vspace{0.2cm} (%(collaboration)s) \\
-}
-
-%(affiliations)s
-"""
-
-aastex_document = r"""
-\documentclass[preprint]{aastex}
-
-\begin{document}
-\title{%(title)s}
+@register_renderer
+class RevtexRenderer(Renderer):
+    """ One \\author and its \\affiliation(s) per author. """
+    name = 'revtex'
+
+    def get_authorkey(self, d):
+        authorkey = '{%s}'%(d.authorname)
+        if self.orcid and d.orcid:
+            authorkey = '[%s]'%d.orcid + authorkey
+        return authorkey
+
+    def get_authdict(self, authors):
+        """ Group the affiliations of each author. """
+        authdict = odict()
+        affidx, affiliations = get_affiliations(authors)
+        for d,affid in zip(authors,affidx):
+            check_author(d)
+            authdict.setdefault(self.get_authorkey(d),[]).append(affid)
+        return authdict, affiliations
+
+    def iter_authors(self, authdict, affiliations):
+        """ Yield each author with its affiliations. """
+        for key,val in authdict.items():
+            args = (key,)+tuple(affiliations[v] for v in val)
+            yield self.get_fragment('author:'+key,args,self.format_author)
 
-%(authlist)s
+    def format_author(self, key, *affiliations):
+        author = r'\author%s'%key+'\n'
+        for affiliation in affiliations:
+            author += r'\affiliation{%s}'%affiliation+'\n'
+        return author + '\n'
 
-\begin{abstract}
-%(abstract)s
-\end{abstract}
-\maketitle
-\end{document}
-"""
+    def get_params(self, authors):
+        authdict, affiliations = self.get_authdict(authors)
+        return dict(authors=self.iter_authors(authdict,affiliations))
 
 ### AASTEX 6.X ###
-aastex6_authlist = r"""
-%(authors)s
-
-\collaboration{(%(collaboration)s)}
-"""
-
-aastex6_document = r"""
-\documentclass[twocolumn]{aastex61}
-
-\begin{document}
-\title{%(title)s}
-
-%(authlist)s
-
-\begin{abstract}
-%(abstract)s
-\end{abstract}
-\maketitle
-\end{document}
-"""
+@register_renderer
+class Aastex6Renderer(RevtexRenderer):
+    name = 'aastex6'
 
 ### AASTEX 7.X ###
-aastex7_authlist = r"""
-\suppressAffiliations
-\correspondingauthor{%(corrauthor)s}
-
-%(authors)s
+@register_renderer
+class Aastex7Renderer(RevtexRenderer):
+    """ Like revtex, with given/surnames and the email of each author. """
+    name = 'aastex7'
+    columns = ['Affiliation','Email']
+
+    def get_authorkey(self, d):
+        authorkey = '{%s}'%(d.authorname)
+        if self.orcid and d.orcid:
+            authorkey = "[%s, gname='%s', sname='%s']"%(d.orcid,d.firstname,d.lastname) + authorkey
+        else:
+            # Appears to be a bug in the AASTeX such that omitting one of them kills the compilation.
+            authorkey = "[0000-0000-0000-0000,gname='%s', sname='%s']"%(d.firstname,d.lastname) + authorkey
+        return authorkey
 
-%% Place \allauthors before \end{document} to list all authors.
-%% Number in first brackets below is how many author names to put on front page
-\collaboration{1}{(%(collaboration)s)}
-%% See https://journals.aas.org/aastexguide/#title_author for more details
-"""
+    def get_params(self, authors):
+        # Assume first author is the corresponding author
+        corrauthor = authors[0].authorname if len(authors) else None
+        author_email = dict((self.get_authorkey(d),d.email) for d in authors)
 
-aastex7_document = r"""
-\documentclass[twocolumn]{aastex7}
+        authdict, affiliations = self.get_authdict(authors)
+        return dict(authors=self.iter_authors(authdict,affiliations,author_email),
+                    corrauthor=corrauthor)
 
-\begin{document}
-\title{%(title)s}
+    def iter_authors(self, authdict, affiliations, author_email):
+        for key,val in authdict.items():
+            args = (key,author_email[key])+tuple(affiliations[v] for v in val)
+            yield self.get_fragment('author:'+key,args,self.format_author)
 
-%(authlist)s
+    def format_author(self, key, email, *affiliations):
+        author = r'\author%s'%key+'\n'
+        for affiliation in affiliations:
+            author += r'\affiliation{%s}'%affiliation+'\n'
+        author += r'\email{%s}'%email + '\n'
+        return author + '\n'
 
-\begin{abstract}
-%(abstract)s
-\end{abstract}
-\maketitle
-\newpage
-\allauthors
-\end{document}
-"""
+### AASTEX ###
+@register_renderer
+class AastexRenderer(Renderer):
+    """ Authors with affiliation marks, followed by the affiliations. """
+    name = 'aastex'
+    affilmark = r'\altaffilmark{%s},'
+    affiltext = r'\altaffiltext{%i}{%s}'
+
+    def get_params(self, authors):
+        authdict = odict()
+        affidx, affiliations = get_affiliations(authors)
+        for dat_auth,affid in zip(authors,affidx):
+            logging.debug(dat_auth.authorname)
+            check_author(dat_auth)
+            authdict.setdefault(dat_auth.authorname,[]).append(affid)
+
+        affiltexts = self.iter_affiltexts(affiliations)
+        return dict(authors=iter_join('\n',self.iter_authors(authdict)),
+                    affiliations=iter_join('\n',affiltexts))
+
+    def iter_authors(self, authdict):
+        """ Yield each author name with its affiliation marks. """
+        for i, (k,v) in enumerate(authdict.items()):
+            marks = ','.join([str(_v+self.idx) for _v in v])
+            args = (k,marks,i+1==len(authdict))
+            yield self.get_fragment('author:'+k,args,self.format_author)
+
+    def format_author(self, k, marks, last):
+        affmark = self.affilmark%marks
+        if last:
+            # Strip trailing comma from last entry (note MNRAS comma position)
+            affmark = affmark.strip(',')
+            # Prefix 'and' on last entry (seems robust)
+            k = 'and ' + k
+        return k + affmark
 
 ### EMULATEAPJ ###
-emulateapj_document = r"""
-\documentclass[iop]{emulateapj}
-
-\begin{document}
-\title{%(title)s}
-
-%(authlist)s
-
-\begin{abstract}
-%(abstract)s
-\end{abstract}
-\maketitle
-\end{document}
-"""
+@register_renderer
+class EmulateapjRenderer(AastexRenderer):
+    name = 'emulateapj'
+    authlist = 'aastex_authlist'
+    affiltext = r'\affil{$^{%i}$ %s}'
 
 ### MNRAS ###
-mnras_authlist = r"""
-\author[%(collaboration)s]{
-\parbox{\textwidth}{
-\Large
-%(authors)s
-\begin{center} (%(collaboration)s) \end{center}
-}
-\vspace{0.4cm}
-\\
-\parbox{\textwidth}{
-%%\scriptsize
-%(affiliations)s
-}
-}
-"""
-
-mnras_document = r"""
-\documentclass{mnras}
-\pagestyle{empty}
-\begin{document}
-\title{%(title)s}
+@register_renderer
+class MnrasRenderer(AastexRenderer):
+    name = 'mnras'
+    affilmark = r',$^{%s}$'
+    affiltext = r'$^{%i}$ %s\\'
 
-%(authlist)s
-
-\maketitle
-\begin{abstract}
-%(abstract)s
-\end{abstract}
-
-\end{document}
-"""
+### AANDA ###
+@register_renderer
+class AandaRenderer(AastexRenderer):
+    name = 'aanda'
+    affilmark = r' \inst{%s},'
+    affiltext = r'\and %s '
+
+    def format_affiliation(self, idx, name):
+        institution = name.rstrip(' ').lstrip(' ')
+        if institution == '':
+            pass #continue
+        affiliation = self.affiltext%(institution)
+        if idx == self.idx:
+            affiliation = affiliation.lstrip('\\and ')
+        return affiliation
 
 ### ELSEVIER ###
-elsevier_authlist = r"""
-%(authors)s
-
-%(affiliations)s
-"""
-
-elsevier_document = r"""
-\documentclass[final,5p]{elsarticle}
-\begin{document}
-
-\begin{frontmatter}
-\title{%(title)s}
-
-%(authlist)s
-
-\begin{abstract}
-%(abstract)s
-\end{abstract}
-\end{frontmatter}
+@register_renderer
+class ElsevierRenderer(Renderer):
+    """ Authors with affiliation indices, followed by the addresses. """
+    name = 'elsevier'
+    affiltext = r'\address[%i]{%s}'
+
+    def get_params(self, authors):
+        authdict = odict()
+        affidx, affiliations = get_affiliations(authors)
+        for d,affid in zip(authors,affidx):
+            check_author(d)
+            authdict.setdefault(d.authorname,[]).append(affid)
+
+        # Each entry starts with '\author' and ends with '}', so (unlike
+        # arxiv) there are no commas to strip from the ends of the list
+        return dict(authors=iter_join('\n',self.iter_authors(authdict)),
+                    affiliations=iter_join('\n',self.iter_affiltexts(affiliations)))
+
+    def iter_authors(self, authdict):
+        for k,v in authdict.items():
+            args = (k,','.join([str(_v+self.idx) for _v in v]))
+            yield self.get_fragment('author:'+k,args,self.format_author)
 
-\end{document}
-"""
+    def format_author(self, k, marks):
+        return r'\author[%s]{%s}'%(marks,k)
 
 ### ARXIV ###
-arxiv_authlist = r"""%(authors)s"""
-arxiv_document = arxiv_authlist
-
-### AANDA ###
-aanda_authlist = r"""
-\author{
-%(authors)s,
-%%\begin{center} (%(collaboration)s) \end{center}
-}
-%%\vspace{0.4cm}
-
-\scriptsize
-\institute{
-%(affiliations)s
-}
-"""
-
-aanda_document = r"""
-%% If you have a really long author list, you can read A&A style manual and
-%% use the \documentclass[longauth]{aa} document style, as well as \longauthor
-%% for many collaborators.
-%% The Collaboration is included but commented out for same reasons
-
-\documentclass{aa}
-%%\pagestyle{empty}
-
-\begin{document}
-\title{%(title)s}
-
-%(authlist)s
-
-\abstract{%(abstract)s}
-
-%%\keywords{ -- }
-
-
-\maketitle
-\end{document}
-"""
+@register_renderer
+class ArxivRenderer(Renderer):
+    """ Plain text list of unique author names. """
+    name = 'arxiv'
+    columns = []
+
+    def get_authlist(self):
+        authlist = get_template('arxiv_authlist')
+        if self.sort:
+            return '%(collaboration)s: ' + authlist
+        return authlist + ' (%(collaboration)s)'
+
+    def get_params(self, authors):
+        authdict = odict()
+        for d in authors:
+            check_author(d,affiliation=False)
+            authdict.setdefault(d.authorname,[]).append(d.affiliation)
 
+        authors=[]
+        for k,v in authdict.items():
+            author = re.sub(r'(?<!\\)~',' ',k).replace(r'\ ',' ').replace('{','').replace('}','')
+            authors.append(author)
 
-if __name__ == "__main__":
-    import argparse
+        return dict(authors=', '.join(authors).strip(','),affiliations='')
+
+def get_columns(journals, orcid=False, cntrb=False):
+    """ Get the csv columns needed to order and render an author list.
+
+    Parameters:
+    journals : list of journal names
+    orcid    : include ORCID information
+    cntrb    : create the contribution list
+
+    Returns:
+    columns : list of column names
+    """
+    columns = ['Lastname','Firstname','Authorname','JoinedAsBuilder','AuthorType']
+    for journal in journals:
+        columns += [c for c in get_renderer(journal).columns if c not in columns]
+    if orcid:
+        columns += ['ORCID']
+    if cntrb:
+        columns += ['Contribution']
+    return columns
+
+def load(filename, cache=False, columns=None, jobs=1):
+    """ Load an author list from a PubDB csv file.
+
+    Parameters:
+    filename : input csv file
+    cache    : use (and create) a binary table cache next to the csv file
+    columns  : only create these columns, reading the file through a
+               memory map (see read_csv_mmap and get_columns)
+    jobs     : number of processes for parsing large files
+
+    Parquet and Arrow IPC (Feather) files are read with pyarrow (see
+    read_table). Standard input ('-') and compressed files are always
+    streamed through read_csv (the other options need a regular file).
+
+    Returns:
+    data : author list record array
+    """
+    if get_table_format(filename) is not None:
+        return read_table(filename)
+
+    if is_stream(filename):
+        return read_csv(filename)
+
+    if cache:
+        data = read_table_cache(filename)
+        if data is not None:
+            return data
+
+    if columns is not None:
+        # The cache is only written for the complete table
+        return read_csv_mmap(filename, columns, jobs=jobs)
+
+    if jobs > 1:
+        data = read_csv_mmap(filename, jobs=jobs)
+    else:
+        data = read_csv(filename)
+
+    if cache:
+        try:
+            write_table_cache(filename,data)
+        except (IOError, OSError) as e:
+            logging.warn("Could not write table cache: %s"%e)
+
+    return data
+
+def order(data, sort=False, sort_builder=False, sort_nonbuilder=False, aux=None):
+    """ Reorder an author list.
+
+    Parameters:
+    data            : author list record array
+    sort            : alphabetize the entire author list
+    sort_builder    : alphabetize the builders
+    sort_nonbuilder : alphabetize the non-builders
+    aux             : auxiliary ordering file or list of (lastname, firstname)
+
+    Returns:
+    data : reordered author list record array
+    """
+    if isinstance(aux,str):
+        aux = read_aux(aux)
+    return data[get_order(data, sort=sort, sort_builder=sort_builder,
+                          sort_nonbuilder=sort_nonbuilder, aux=aux)]
+
+def render(data, journal=None, doc=None, orcid=None, idx=None, sort=None,
+           collaboration=None, stream=None, state=None, config=None):
+    """ Render an author list for a journal.
+
+    The options are taken from 'config' (a RenderConfig), and the
+    keyword options that are not None replace its values. Rendering
+    uses no module state, so it can run in several threads at once.
+
+    Parameters:
+    data          : (ordered) author list record array or list of Author records
+    journal       : journal name or latex document class (default: 'apj')
+    doc           : create standalone latex document
+    orcid         : include ORCID information (revtex and aastex)
+    idx           : starting affiliation index
+    sort          : the author list is alphabetized (arxiv format)
+    collaboration : collaboration name
+    stream        : file-like object to write the output to (optional)
+    state         : fragments of a previous run to reuse, replaced by the
+                    fragments of this run (see Renderer.get_fragment)
+    config        : rendering options (see RenderConfig)
+
+    Returns:
+    output : the latex author list (or document)
+    """
+    fragments = iter_render(data, journal=journal, doc=doc, orcid=orcid,
+                            idx=idx, sort=sort, collaboration=collaboration,
+                            state=state, config=config)
+    if stream is None:
+        return ''.join(fragments)
+
+    output = []
+    for fragment in fragments:
+        stream.write(fragment)
+        output.append(fragment)
+    return ''.join(output)
+
+def iter_render(data, journal=None, doc=None, orcid=None, idx=None, sort=None,
+                collaboration=None, state=None, config=None):
+    """ Render an author list for a journal piece by piece.
+
+    Same parameters as render, but the output is yielded as fragments
+    (e.g., one per author) so that long author lists can be written
+    without building the whole document in memory (see write_fragments).
+
+    Returns:
+    fragments : generator of output strings
+    """
+    config = get_config(config, journal=journal, doc=doc, orcid=orcid, idx=idx,
+                        sort=sort, collaboration=collaboration)
+    renderer = get_renderer(config.journal)(config, state=state)
+    return renderer.iter_render(get_authors(data))
+
+def get_journals():
+    """ Get one journal name for each latex document class.
+
+    The journal name is the document class itself when that is a journal
+    name (e.g., 'aastex6'), otherwise the first journal name of the class
+    (e.g., 'aastex5' for the 'aastex' class).
+    """
+    load_entry_points()
+    journals = odict()
+    for journal,cls in journal2class.items():
+        if journal == cls: journals[cls] = journal
+        else: journals.setdefault(cls,journal)
+    return list(journals.values())
+
+def unique_journals(journals):
+    """ Drop journal names with the document class of an earlier one. """
+    classes = odict()
+    for journal in journals:
+        cls = journal2class.get(journal,journal)
+        if cls in classes:
+            logging.info("Skipping %s (same document class as %s)"%(
+                journal,classes[cls]))
+            continue
+        classes[cls] = journal
+    return list(classes.values())
+
+def render_journals(data, journals=None, jobs=1, **kwargs):
+    """ Render an author list for several journals.
+
+    The author list is loaded and ordered once, and only the rendering
+    is repeated for each journal. With jobs > 1 the journals are
+    rendered in parallel by a pool of worker processes.
+
+    Parameters:
+    data     : (ordered) author list record array or list of Author records
+    journals : list of journal names (default: one per document class)
+    jobs     : number of parallel rendering processes
+    kwargs   : passed to render
+
+    Returns:
+    outputs : ordered dictionary of the output for each journal
+    """
+    if journals is None:
+        journals = get_journals()
+    # Build the author records once for all journals
+    data = get_authors(data)
+
+    if jobs > 1 and len(journals) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(render,data,journal=j,**kwargs)
+                       for j in journals]
+            outputs = [f.result() for f in futures]
+    else:
+        outputs = [render(data,journal=j,**kwargs) for j in journals]
+
+    return odict(zip(journals,outputs))
+
+### ASYNC ###
+def render_file(filename, aux=None, sort_builder=False, sort_nonbuilder=False,
+                cache=False, **kwargs):
+    """ Load, order, and render an author list file.
+
+    Parameters:
+    filename        : input csv (or table) file
+    aux             : auxiliary ordering file or list of (lastname, firstname)
+    sort_builder    : alphabetize the builders
+    sort_nonbuilder : alphabetize the non-builders
+    cache           : use (and create) the binary table cache (see load)
+    kwargs          : rendering options passed to render (e.g., journal, sort)
+
+    Returns:
+    output : the latex author list (or document)
+    """
+    config = get_config(kwargs.pop('config',None), **kwargs)
+    data = load(filename, cache=cache)
+    data = order(data, sort=config.sort, sort_builder=sort_builder,
+                 sort_nonbuilder=sort_nonbuilder, aux=aux)
+    return render(data, config=config)
+
+async def arender(source, executor=None, **kwargs):
+    """ Render an author list without blocking the event loop.
+
+    Reading and rendering run in an executor (the default thread pool
+    of the loop, or e.g. a ProcessPoolExecutor for large lists).
+
+    Parameters:
+    source   : input file (loaded and ordered, see render_file), or an
+               (ordered) author list record array or list of Author records
+    executor : concurrent.futures executor (default: loop default)
+    kwargs   : options passed to render_file (or to render)
+
+    Returns:
+    output : the latex author list (or document)
+    """
+    import asyncio
+    import functools
+    func = render_file if isinstance(source,str) else render
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func,source,**kwargs))
+
+def arender_as_completed(requests, limit=None, executor=None):
+    """ Render a batch of author lists asynchronously.
+
+    At most 'limit' lists are rendered at once. Like
+    asyncio.as_completed, this must be called from a running event
+    loop and returns an iterator of awaitables in order of completion:
+
+        for result in mkauthlist.arender_as_completed(requests, limit=4):
+            index, output, error = await result
+
+    Parameters:
+    requests : list of (source, options) to pass to arender
+    limit    : maximum number of concurrent renders (default: cpu count)
+    executor : concurrent.futures executor (default: loop default)
+
+    Returns:
+    results : iterator of awaitables of (index, output, error), where
+              error is the exception of a failed request (else None)
+    """
+    import asyncio
+    if limit is None:
+        limit = os.cpu_count() or 1
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run_request(index, source, options):
+        async with semaphore:
+            try:
+                output = await arender(source, executor=executor, **options)
+            except Exception as e:
+                return index, None, e
+        return index, output, None
+
+    tasks = [asyncio.ensure_future(run_request(i,source,options))
+             for i,(source,options) in enumerate(requests)]
+    return asyncio.as_completed(tasks)
+
+def journal_filename(filename, journal):
+    """ Output filename for a journal (e.g., 'authlist_mnras.tex'). """
+    base,ext = os.path.splitext(filename)
+    return '%s_%s%s'%(base,journal,ext)
+
+def parse_journals(value):
+    """ Parse a comma-separated list of journal names. """
+    journals = [j.strip().lower() for j in value.split(',') if j.strip()]
+    if any(journal not in journal2class for journal in journals):
+        load_entry_points()
+    for journal in journals:
+        if journal not in journal2class:
+            msg = "invalid journal: %r (choose from %s)"%(
+                journal,', '.join(sorted(journal2class.keys())))
+            raise argparse.ArgumentTypeError(msg)
+    return journals
+
+class VersionAction(argparse.Action):
+    """ Print the version number and exit.
+
+    Unlike the builtin 'version' action, the version is only resolved
+    when the option is used.
+    """
+    def __init__(self, option_strings, dest=argparse.SUPPRESS,
+                 default=argparse.SUPPRESS, help=None):
+        super(VersionAction,self).__init__(option_strings=option_strings,
+                                           dest=dest, default=default,
+                                           nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        print('%s %s'%(parser.prog,get_version()))
+        parser.exit()
+
+def get_parser():
+    """ Build the command line argument parser. """
     description = __doc__
     formatter = argparse.RawDescriptionHelpFormatter
     parser = argparse.ArgumentParser(description=description,
                                      formatter_class=formatter)
     parser.add_argument('infile', metavar='DES-XXXX-XXXX_author_list.csv',
-                        help="input csv file from PubDB")
+                        help="input csv file from PubDB ('-' for standard input; \
+                        .gz, .bz2, and .xz files are decompressed; .parquet and \
+                        .feather files are read with pyarrow).")
     parser.add_argument('outfile', metavar='DES-XXXX-XXXX_author_list.tex',
                         nargs='?', default=None, help="output latex file (optional).")
     parser.add_argument('-a','--aux', metavar='order.csv',
@@ -368,9 +1903,41 @@ if __name__ == "__main__":
     parser.add_argument('-i','--idx', default=1, type=int,
                         help="starting index for aastex author list \
                         (useful for multi-collaboration papers).")
-    parser.add_argument('-j','--journal', default='apj',
-                        choices=sorted(journal2class.keys()),
-                        help="journal name or latex document class.")
+    parser.add_argument('-j','--journal', default='apj', type=parse_journals,
+                        metavar='{%s}'%(','.join(sorted(journal2class.keys()))),
+                        help="journal name or latex document class (a comma-separated \
+                        list writes one output file per journal).")
+    parser.add_argument('--all-journals', action='store_true',
+                        help="write one output file for each document class.")
+    parser.add_argument('--jobs', default=1, type=int,
+                        help="number of processes for parsing large csv files \
+                        and rendering multiple journals (or papers in batch mode).")
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        default=os.environ.get('MKAUTHLIST_CACHE_DIR'),
+                        help="cache outputs by a hash of the inputs and options; \
+                        unchanged inputs are not parsed or rewritten \
+                        (default: $MKAUTHLIST_CACHE_DIR).")
+    parser.add_argument('--cache-size', metavar='MB', default=100, type=float,
+                        help="maximum size of the output cache.")
+    parser.add_argument('--table-cache', action='store_true',
+                        help="cache the parsed csv file in a binary sidecar file \
+                        (DES-XXXX-XXXX_author_list.csv.npz) for faster reloading.")
+    parser.add_argument('--mmap', action='store_true',
+                        help="read the csv file through a memory map and only \
+                        create the columns needed for the journal(s) (for very \
+                        large author lists).")
+    parser.add_argument('--write-table', metavar='TABLE.parquet',
+                        help="write the parsed author table to a Parquet or \
+                        Arrow IPC (.feather, .arrow) file.")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running and regenerate the output(s) when the \
+                        input, auxiliary, or output files change.")
+    parser.add_argument('--poll', action='store_true',
+                        help="poll for changes in watch mode (instead of inotify).")
+    parser.add_argument('--batch', action='store_true',
+                        help="batch mode: infile is a directory or glob of csv files \
+                        (or a text file with the arguments for one paper per line) \
+                        and outfile is the output directory.")
     parser.add_argument('--orcid', action='store_true',
                         help="include ORCID information (revtex and aastex).")
     parser.add_argument('-s','--sort', action='store_true',
@@ -381,347 +1948,1140 @@ if __name__ == "__main__":
                         help="alphabetize the non-builder list.")
     parser.add_argument('-v','--verbose', action='count', default=0,
                         help="verbose output.")
-    parser.add_argument('-V','--version', action='version',
-                        version='%(prog)s '+__version__,
+    parser.add_argument('-V','--version', action=VersionAction,
                         help="print version number and exit.")
-    args = parser.parse_args()
-
-    if args.verbose == 1: level = logging.INFO
-    elif args.verbose >= 2: level = logging.DEBUG
-    else: level = logging.WARNING
-    logging.basicConfig(format="%% %(levelname)s: %(message)s", level=level)
-
-    defaults['collaboration'] = args.collab
-
-    readlines = open(args.infile).readlines()
-    # Check for unescaped umlauts
-    lines = check_umlaut(readlines)
-    rows = []
-    for arow in csv.reader(lines, skipinitialspace=True):
-        if len(arow)!=0 and not arow[0].startswith('#'):
-            rows.append(arow)
-
-    data = np.rec.fromrecords(rows[1:], names=rows[0])
-
-    isbuilder  = get_builders(data)
-    builder    = data[isbuilder]
-    nonbuilder = data[~isbuilder]
-
-    if args.sort_builder:
-        idx = np.lexsort((np.char.upper(builder['Firstname']),
-                          np.char.upper(builder['Lastname'])))
-        builder = builder[idx]
-
-    if args.sort_nonbuilder:
-        idx = np.lexsort((np.char.upper(nonbuilder['Firstname']),
-                          np.char.upper(nonbuilder['Lastname'])))
-        nonbuilder = nonbuilder[idx]
-
-    data = np.hstack([nonbuilder,builder])
-
-    if args.sort:
-        idx = np.lexsort((np.char.upper(data['Firstname']),
-                          np.char.upper(data['Lastname'])))
-        data = data[idx]
-        #data = data[np.argsort(np.char.upper(data['Lastname']))]
-
-    cls = journal2class[args.journal.lower()]
-    affidict = odict()
-    authdict = odict()
-
-    # Hack for umlauts in affiliations...
-    for k, v in HACK.items():
-        logging.warn("Hacking '%s' ..."%k)
-        select = (np.char.count(data['Affiliation'],k) > 0)
-        data['Affiliation'][select] = v
+    return parser
+
+def get_input_columns(args):
+    """ Csv columns to read for one parsed command line (None for all). """
+    if not args.mmap:
+        return None
+    journals = get_journals() if args.all_journals else args.journal
+    return get_columns(journals, orcid=args.orcid, cntrb=args.cntrb)
+
+def write_input_table(args):
+    """ Parse the input file and write it with '--write-table'. """
+    data = load(args.infile, cache=args.table_cache,
+                columns=get_input_columns(args), jobs=args.jobs)
+    write_table(args.write_table, data)
+
+def make_outputs(args, header='', tables=None, states=None):
+    """ Create the author list(s) for one parsed command line.
+
+    Parameters:
+    args   : parsed command line arguments (see get_parser)
+    header : text to prepend to each author list
+    tables : parsed tables to reuse (TableCache, see watch)
+    states : dictionary of the rendering state of each output file to
+             reuse (see watch)
+
+    Returns:
+    outputs : ordered dictionary of {filename: parts} (filename is None
+              for standard output); the parts are strings and generators
+              of fragments that are only rendered when written (see
+              write_outputs and get_text)
+    """
+    journals = get_journals() if args.all_journals else args.journal
+    # Render each document class once
+    journals = unique_journals(journals)
+
+    columns = get_input_columns(args)
+    def load_table():
+        return load(args.infile, cache=args.table_cache, columns=columns,
+                    jobs=args.jobs)
+    if tables is not None and args.infile != '-':
+        key = (get_file_hash(args.infile), tuple(columns or []))
+        data = tables.get(key, load_table)
+    else:
+        data = load_table()
+    if args.write_table:
+        write_table(args.write_table, data)
 
     # Pre-sort the csv file by the auxiliary file
-    if args.aux is not None:
-        auxcols = ['Lastname','Firstname']
-        # aux = [[r[c] for c in auxcols] for r in
-        #        csv.DictReader(open(args.aux),fieldnames=auxcols)
-        #        if not r[auxcols[0]].startswith('#')]
-        aux = []
-        for r in csv.DictReader(open(args.aux), fieldnames=auxcols):
-            if not r[auxcols[0]].startswith('#'):
-                aux.append([r[c] for c in auxcols])
-
-        aux = np.rec.fromrecords(aux,names=auxcols)
-        if len(np.unique(aux)) != len(aux):
-            logging.error('Non-unique names in aux file.')
-            print(open(args.aux).read())
-            raise Exception()
-
-        # This is probably not the cleanest way to do this...
-        raw_auth = [data['Lastname'],data['Firstname'],np.arange(len(data))]
-        raw = np.vstack(raw_auth).T
-
-        order = np.empty((0, raw.shape[-1]), dtype=raw.dtype)
-        for r in aux:
-            lastname = r['Lastname'].strip()
-            firstname = r['Firstname']
-            match = (raw[:,0] == lastname)
-
-            if firstname:
-                firstname = r['Firstname'].strip()
-                match &= (raw[:,1] == firstname)
-
-            # Check that match found
-            if np.sum(match) < 1:
-                msg = "Auxiliary name not found: %s"%(lastname)
-                if firstname: msg += ', %s'%firstname
-                logging.warn(msg)
-                continue
-
-            # Check unique firstname
-            if not len(np.unique(raw[match][:,1])) == 1:
-                msg = "Non-unique name: %s"%(lastname)
-                if firstname: msg += ', %s'%firstname
-                logging.error(msg)
-                raise ValueError(msg)
+    data = order(data, sort=args.sort, sort_builder=args.sort_builder,
+                 sort_nonbuilder=args.sort_nonbuilder, aux=args.aux)
+    config = RenderConfig(doc=args.doc, orcid=args.orcid, idx=args.idx,
+                          sort=args.sort, collaboration=args.collab)
+    outfiles = odict()
+    for journal in journals:
+        outfile = args.outfile
+        if outfile is not None and len(journals) > 1:
+            outfile = journal_filename(outfile,journal)
+        outfiles[journal] = outfile
 
-            order = np.vstack([order,raw[match]])
-            raw = raw[~match]
-        order = np.vstack([order,raw])
-        data = data[order[:,-1].astype(int)]
-
-    ### REVTEX ###
-    if cls in ['revtex','aastex6']:
-        if cls == 'revtex':
-            document = revtex_document
-            authlist = revtex_authlist
-        elif cls in ['aastex6']:
-            document = aastex6_document
-            authlist = aastex6_authlist
+    if args.jobs > 1 and len(journals) > 1 and states is None:
+        rendered = render_journals(data, journals, jobs=args.jobs, config=config)
+    else:
+        # Render lazily while writing
+        authors = get_authors(data)
+        rendered = odict()
+        for journal,outfile in outfiles.items():
+            if states is not None:
+                state = states.setdefault((outfile,journal),dict())
+                rendered[journal] = iter_render(authors, journal=journal,
+                                                config=config, state=state)
+            else:
+                rendered[journal] = iter_render(authors,journal=journal,config=config)
+
+    outputs = odict()
+    for journal,output in rendered.items():
+        outfile = outfiles[journal]
+        if outfile in outputs:
+            # Multiple journals printed to standard output
+            outputs[outfile] += ['\n', header, output]
         else:
-            msg = "Unrecognized latex class: %s"%cls
-            raise Exception(msg)
-
-        for i,d in enumerate(data):
-            if d['Affiliation'] == '':
-                logging.warn("Blank affiliation for '%s'"%d['Authorname'])
-            if d['Authorname'] == '':
-                logging.warn("Blank authorname for '%s %s'"%(d['Firstname'],
-                                                             d['Lastname']))
-
-            authorkey = '{%s}'%(d['Authorname'])
-
-            if args.orcid and d['ORCID']:
-                authorkey = '[%s]'%d['ORCID'] + authorkey
+            outputs[outfile] = [header, output]
 
-            if authorkey not in authdict.keys():
-                authdict[authorkey] = [d['Affiliation']]
-            else:
-                authdict[authorkey].append(d['Affiliation'])
-            #if d['Authorname'] not in authdict.keys():
-            #    authdict[d['Authorname']] = [d['Affiliation']]
-            #else:
-            #    authdict[d['Authorname']].append(d['Affiliation'])
+    if args.cntrb:
+        outputs[args.cntrb] = [iter_contributions(get_cntrbdict(data))]
 
-        authors = []
-        for key,val in authdict.items():
-            #author = r'\author{%s}'%key+'\n'
-            author = r'\author%s'%key+'\n'
-            for v in val:
-                author += r'\affiliation{%s}'%v+'\n'
-            author += '\n'
-            authors.append(author)
-        params = dict(defaults,authors=''.join(authors))
+    return outputs
 
-    # AASTEX 7 updates
-    if cls in ['aastex7']:
-        document = aastex7_document
-        authlist = aastex7_authlist
-        # Assume first author is the corresponding author
-        corrauthor = None
-        author_email = {}
-
-        for i,d in enumerate(data):
-            if d['Affiliation'] == '':
-                logging.warn("Blank affiliation for '%s'"%d['Authorname'])
-            if d['Authorname'] == '':
-                logging.warn("Blank authorname for '%s %s'"%(d['Firstname'],
-                                                             d['Lastname']))
-
-            if corrauthor is None:
-                corrauthor = d['Authorname']
-            authorkey = '{%s}'%(d['Authorname'])
-
-            if args.orcid and d['ORCID']:
-                authorkey = "[%s, gname='%s', sname='%s']"%(d['ORCID'],d['Firstname'],d['Lastname']) + authorkey
-            else:
-                # Appears to be a bug in the AASTeX such that omitting one of them kills the compilation.
-                authorkey = "[0000-0000-0000-0000,gname='%s', sname='%s']"%(d['Firstname'],d['Lastname']) + authorkey
+def iter_parts(parts):
+    """ Yield the fragments of an output (a string or list of parts). """
+    if isinstance(parts,str):
+        parts = [parts]
+    for part in parts:
+        if isinstance(part,str):
+            yield part
+        else:
+            for fragment in part:
+                yield fragment
+
+def get_text(parts):
+    """ Join the fragments of an output into one string. """
+    return ''.join(iter_parts(parts))
+
+def iter_digest(parts, sha):
+    """ Yield the fragments of an output and add them to a hash. """
+    for fragment in iter_parts(parts):
+        sha.update(fragment.encode('utf-8'))
+        yield fragment
+
+def write_file(filename, content):
+    """ Replace a file with new content in one step.
+
+    The content (bytes, or an iterable of text fragments that are
+    written as they are rendered) goes to a temporary file in the same
+    directory, which is then renamed over the file. Readers never see a
+    partially written file, and the previous file is kept if writing
+    fails.
+    """
+    tmpname = filename + '.%i.%i.tmp'%(os.getpid(),threading.get_ident())
+    try:
+        if isinstance(content,bytes):
+            with open(tmpname,'wb') as f:
+                f.write(content)
+        else:
+            with open(tmpname,'w') as f:
+                write_fragments(f,content)
+        os.replace(tmpname,filename)
+    except BaseException:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+        raise
+
+def write_outputs(outputs, force=False):
+    """ Write the output files.
+
+    Files whose content is unchanged are not rewritten (so their
+    modification time is preserved), and existing files are only
+    overwritten with 'force'. Files are written as the fragments are
+    rendered (the whole text is never held in memory) and replaced in
+    one step (see write_file). Standard output is written as the
+    fragments are rendered, so that partial output appears promptly.
+
+    Parameters:
+    outputs : ordered dictionary of {filename: text or parts}
+    force   : overwrite existing files
+
+    Returns:
+    None
+    """
+    for outfile,output in outputs.items():
+        if outfile is None:
+            write_fragments(sys.stdout,iter_parts(output))
+            sys.stdout.write('\n')
+            sys.stdout.flush()
+            continue
+
+        if os.path.exists(outfile):
+            output = get_text(output)
+            with open(outfile,'r') as f:
+                if f.read() == output:
+                    logging.info("%s is up to date"%outfile)
+                    continue
+            if not force:
+                logging.warn("Found %s; skipping..."%outfile)
+                continue
 
-            if authorkey not in authdict.keys():
-                authdict[authorkey] = [d['Affiliation']]
-            else:
-                authdict[authorkey].append(d['Affiliation'])
+        logging.info('Writing %s'%outfile)
+        write_file(outfile,iter_parts(output))
 
-            author_email[authorkey] = d['Email']
+def get_cache_key(args, header=''):
+    """ Hash of everything that determines the output of a run.
 
-        authors = []
-        for key,val in authdict.items():
-            #author = r'\author{%s}'%key+'\n'
-            author = r'\author%s'%key+'\n'
-            for v in val:
-                author += r'\affiliation{%s}'%v+'\n'
-            author += r'\email{%s}'%author_email[key] + '\n'
-            author += '\n'
-            authors.append(author)
-        params = dict(defaults,authors=''.join(authors),corrauthor=corrauthor)
-
-    ### Separate author and affiliation ###
-    if cls in ['aastex','mnras','emulateapj', 'aanda']:
-        if cls == 'aastex':
-            document = aastex_document
-            authlist = aastex_authlist
-            affilmark = r'\altaffilmark{%s},'
-            affiltext = r'\altaffiltext{%i}{%s}'
-        elif cls == 'emulateapj':
-            document = emulateapj_document
-            authlist = aastex_authlist
-            affilmark = r'\altaffilmark{%s},'
-            affiltext = r'\affil{$^{%i}$ %s}'
-        elif cls == 'mnras':
-            document = mnras_document
-            authlist = mnras_authlist
-            affilmark = r',$^{%s}$'
-            affiltext = r'$^{%i}$ %s\\'
-        elif cls == 'aanda':
-            document = aanda_document
-            authlist = aanda_authlist
-            affilmark = r' \inst{%s},'
-            affiltext = r'\and %s '
+    This includes the content of the input and auxiliary files, the
+    options that change the output, the header (which records the
+    command line), and the version of mkauthlist.
+    """
+    sha = hashlib.sha1()
+    for filename in [args.infile, args.aux]:
+        if filename is None:
+            sha.update(b'None')
         else:
-            msg = "Unrecognized latex class: %s"%cls
-            raise Exception(msg)
-
-        for iauth, dat_auth in enumerate(data):
-            print(dat_auth['Authorname'])
-            if dat_auth['Affiliation'] == '':
-                logging.warn("Blank affiliation for '%s'"%dat_auth['Authorname'])
-            if dat_auth['Authorname'] == '':
-                logging.warn("Blank authorname for '%s %s'"%(dat_auth['Firstname'],
-                                                             dat_auth['Lastname']))
-
-            if (dat_auth['Affiliation'] not in affidict.keys()):
-                affidict[dat_auth['Affiliation']] = len(affidict.keys())
-            affidx = affidict[dat_auth['Affiliation']]
-
-            if dat_auth['Authorname'] not in authdict.keys():
-                authdict[dat_auth['Authorname']] = [affidx]
-            else:
-                authdict[dat_auth['Authorname']].append(affidx)
-
-        affiliations = []
-        authors=[]
-        for i, (k,v) in enumerate(authdict.items()):
-            affmark = affilmark%(','.join([str(_v+args.idx) for _v in v]))
-            if i+1==len(authdict):
-                # Strip trailing comma from last entry (note MNRAS comma position)
-                affmark = affmark.strip(',')
-                # Prefix 'and' on last entry (seems robust)
-                k = 'and ' + k
-            author = k + affmark
-            authors.append(author)
+            sha.update(get_file_hash(filename).encode('utf-8'))
+
+    options = [args.outfile, args.journal, args.all_journals, args.doc,
+               args.orcid, args.idx, args.sort, args.sort_builder,
+               args.sort_nonbuilder, args.collab, args.cntrb, header,
+               get_version()]
+    sha.update(repr(options).encode('utf-8'))
+    return sha.hexdigest()
+
+def read_cache(cachedir, key):
+    """ Read the cached outputs for a key (None if not cached). """
+    filename = os.path.join(cachedir,key+'.json')
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename,'r') as f:
+            outputs = odict(json.load(f))
+    except ValueError:
+        logging.warn("Corrupt cache file: %s"%filename)
+        return None
+
+    # Mark as recently used
+    os.utime(filename,None)
+    return outputs
+
+def write_cache(cachedir, key, outputs, maxsize=None):
+    """ Cache the outputs and evict the least recently used entries.
+
+    Parameters:
+    cachedir : cache directory
+    key      : cache key (see get_cache_key)
+    outputs  : ordered dictionary of {filename: text}
+    maxsize  : maximum size of the cache directory (MB)
+
+    Returns:
+    None
+    """
+    if not os.path.exists(cachedir):
+        os.makedirs(cachedir)
+
+    filename = os.path.join(cachedir,key+'.json')
+    tmpname = filename + '.%i.tmp'%os.getpid()
+    with open(tmpname,'w') as f:
+        json.dump(list(outputs.items()),f)
+    os.rename(tmpname,filename)
+
+    if maxsize is None: return
+
+    entries = []
+    for name in os.listdir(cachedir):
+        if not name.endswith('.json'): continue
+        path = os.path.join(cachedir,name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime,stat.st_size,path))
+
+    total = sum(e[1] for e in entries)
+    for mtime,size,path in sorted(entries):
+        if total <= maxsize*2**20 or path == filename: break
+        logging.debug("Evicting %s"%path)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+def run(args, header=''):
+    """ Create and write the author list(s) for one parsed command line.
+
+    If a cache directory is configured, the outputs are looked up by a
+    hash of the inputs and options (see get_cache_key) so that unchanged
+    inputs are neither parsed nor rewritten (the table is still written
+    with '--write-table').
+
+    Parameters:
+    args   : parsed command line arguments (see get_parser)
+    header : text to prepend to each author list
+
+    Returns:
+    None
+    """
+    outputs = None
+    if args.cache_dir and args.infile == '-':
+        logging.info("Standard input is not cached")
+    elif args.cache_dir:
+        key = get_cache_key(args,header)
+        outputs = read_cache(args.cache_dir,key)
+        if outputs is not None:
+            logging.info("Found cached output for %s"%args.infile)
+            if args.write_table:
+                write_input_table(args)
+
+    if outputs is None:
+        outputs = make_outputs(args,header)
+        if args.cache_dir and args.infile != '-':
+            outputs = odict((k,get_text(v)) for k,v in outputs.items())
+            write_cache(args.cache_dir,key,outputs,args.cache_size)
+
+    write_outputs(outputs,force=args.force)
+
+def get_header(prog, argv):
+    """ Header lines recording how the output was generated. """
+    header  = "%% Author list file generated with: %s %s \n"%(prog, get_version())
+    header += "%% %s %s \n"%(prog,' '.join(argv))
+    return header
+
+def get_batch(args, parser):
+    """ Get the arguments for each paper in a batch.
+
+    The batch input (args.infile) is either a directory (all
+    '*_author_list.csv' files, optionally compressed), a glob pattern
+    of csv files, or a text
+    file listing one paper per line with its own command line arguments
+    (e.g., 'paper.csv paper.tex -j mnras -a order.csv'). Options given
+    on the batch command line are the defaults for every paper. Lines
+    with invalid arguments are skipped with an error message.
+
+    Parameters:
+    args   : parsed batch command line arguments
+    parser : argument parser (for the per-paper arguments)
+
+    Returns:
+    papers : list of (args, argv) for each paper
+    """
+    csvexts = ['.csv'] + ['.csv'+ext for ext in COMPRESSION]
+
+    papers = []
+    if os.path.isfile(args.infile) and not args.infile.endswith(tuple(csvexts)):
+        with open(args.infile) as f:
+            lines = f.readlines()
+        for lineno,line in enumerate(lines,1):
+            try:
+                argv = shlex.split(line,comments=True)
+                if not argv: continue
+                paper = parser.parse_args(argv)
+                default = parser.parse_args([paper.infile])
+            except (ValueError, SystemExit, argparse.ArgumentError):
+                logging.error("Skipping line %i of %s: %s"%(lineno,args.infile,line.strip()))
+                continue
+            for key,value in vars(args).items():
+                if key in ['infile','outfile']: continue
+                if getattr(paper,key) == getattr(default,key):
+                    setattr(paper,key,value)
+            papers.append((paper,argv))
+    else:
+        patterns = [args.infile]
+        if os.path.isdir(args.infile):
+            patterns = [os.path.join(args.infile,'*_author_list'+ext) for ext in csvexts]
+        filenames = sorted(set(sum([glob.glob(p) for p in patterns],[])))
+        if args.outfile is not None:
+            os.makedirs(args.outfile, exist_ok=True)
+        for filename in filenames:
+            base = filename
+            if get_compression(base) is not None:
+                base = os.path.splitext(base)[0]
+            base = os.path.splitext(base)[0]
+            if args.outfile is not None:
+                # Output directory
+                base = os.path.join(args.outfile,os.path.basename(base))
+            paper = copy.copy(args)
+            paper.infile  = filename
+            paper.outfile = base + '.tex'
+            if args.cntrb:
+                paper.cntrb = base + '_contributions.tex'
+            papers.append((paper,[filename,paper.outfile]))
+
+    for paper,argv in papers:
+        # Papers are run in parallel, not the journals of each paper
+        paper.batch, paper.jobs = False, 1
+    return papers
+
+def run_paper(args, header=''):
+    """ Run one paper of a batch, catching any failure.
+
+    Returns:
+    infile  : input file
+    elapsed : run time (s)
+    error   : error message (None on success)
+    """
+    start = time.time()
+    error = None
+    try:
+        run(args,header)
+    except Exception as e:
+        error = "%s: %s"%(type(e).__name__,e)
+    return args.infile, time.time()-start, error
+
+def run_batch(papers, prog='mkauthlist', jobs=1):
+    """ Run a batch of papers and report the time or failure of each.
+
+    Parameters:
+    papers : list of (args, argv) for each paper (see get_batch)
+    prog   : program name for the output header
+    jobs   : number of parallel processes
+
+    Returns:
+    nfail  : number of failed papers
+    """
+    headers = [get_header(prog,argv) for paper,argv in papers]
+    papers = [paper for paper,argv in papers]
+
+    start = time.time()
+    if jobs > 1 and len(papers) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        results = executor.map(run_paper,papers,headers)
+    else:
+        executor = None
+        results = map(run_paper,papers,headers)
 
-        if cls == 'aanda':
-            for k, v in affidict.items():
-                institution = k.rstrip(' ').lstrip(' ')
-                if institution == '':
-                    pass #continue
-                affiliation = affiltext%(institution)
-                if v == 0:
-                    affiliation = affiliation.lstrip('\\and ')
-                affiliations.append(affiliation)
+    nfail = 0
+    for infile,elapsed,error in results:
+        if error is None:
+            print("%8.3f s  %s"%(elapsed,infile))
         else:
-            for k,v in affidict.items():
-                affiliation = affiltext%(v+args.idx,k)
-                affiliations.append(affiliation)
-
-        params = dict(defaults,authors='\n'.join(authors),affiliations='\n'.join(affiliations))
-
-    ### ELSEVIER ###
-    if cls in ['elsevier']:
-        document = elsevier_document
-        authlist = elsevier_authlist
-        affilmark = r'%i,'
-        affiltext = r'\address[%i]{%s}'
-        for i,d in enumerate(data):
-            if d['Affiliation'] == '':
-                logging.warn("Blank affiliation for '%s'"%d['Authorname'])
-            if d['Authorname'] == '':
-                logging.warn("Blank authorname for '%s %s'"%(d['Firstname'],
-                                                             d['Lastname']))
-
-            if (d['Affiliation'] not in affidict.keys()):
-                affidict[d['Affiliation']] = len(affidict.keys())
-            affidx = affidict[d['Affiliation']]
-
-            if d['Authorname'] not in authdict.keys():
-                authdict[d['Authorname']] = [affidx]
-            else:
-                authdict[d['Authorname']].append(affidx)
-
-        affiliations = []
-        authors=[]
-        for k,v in authdict.items():
-            author = r'\author[%s]{%s}'%(','.join([str(_v+args.idx) for _v in v]),k)
-            authors.append(author)
-
-        for k,v in affidict.items():
-            affiliation = affiltext%(v+args.idx,k)
-            affiliations.append(affiliation)
-
-        params = dict(defaults,authors='\n'.join(authors).strip(','),affiliations='\n'.join(affiliations))
+            nfail += 1
+            print("  FAILED  %s (%s)"%(infile,error))
+    if executor is not None:
+        executor.shutdown()
+
+    print("Processed %i files (%i failed) in %.3f s"%(
+        len(papers),nfail,time.time()-start))
+    return nfail
+
+### WATCH ###
+def get_signature(filename):
+    """ Size and modification time of a file (None if it is missing). """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+class PollWatcher(object):
+    """ Detect changes to files by polling their size and modification time. """
+    def __init__(self, filenames, interval=0.5):
+        self.interval = interval
+        self.signatures = odict((f,get_signature(f)) for f in filenames)
+
+    def wait(self, timeout=None):
+        """ Wait for changes.
+
+        Parameters:
+        timeout : maximum time to wait (s); None waits for a change
+
+        Returns:
+        changed : set of changed files (empty after a timeout)
+        """
+        start = time.time()
+        while True:
+            changed = set()
+            for filename,signature in self.signatures.items():
+                new = get_signature(filename)
+                if new != signature:
+                    self.signatures[filename] = new
+                    changed.add(filename)
+            if changed:
+                return changed
+            if timeout is not None and time.time()-start >= timeout:
+                return changed
+            time.sleep(self.interval if timeout is None else
+                       min(self.interval,timeout))
+
+    def close(self):
+        pass
+
+class InotifyWatcher(object):
+    """ Detect changes to files with Linux inotify (see inotify(7)).
+
+    The directories of the files are watched, so that files replaced by
+    editors (written to a temporary file and renamed) are also seen.
+    """
+    # Events: modify, close_write, moved_from, moved_to, create, delete
+    MASK = 0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+
+    def __init__(self, filenames):
+        import ctypes, ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc,'inotify_init1'):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK|os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(),"inotify_init1 failed")
+
+        self.files = odict((os.path.abspath(f),f) for f in filenames)
+        self.dirs = dict()
+        for path in set(os.path.dirname(p) for p in self.files):
+            wd = libc.inotify_add_watch(self.fd,path.encode('utf-8'),self.MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(),"Could not watch %s"%path)
+            self.dirs[wd] = path
+
+    def wait(self, timeout=None):
+        """ Wait for changes (see PollWatcher.wait). """
+        import select, struct
+        changed = set()
+        if not select.select([self.fd],[],[],timeout)[0]:
+            return changed
+        try:
+            buf = os.read(self.fd,2**16)
+        except BlockingIOError:
+            return changed
+
+        pos = 0
+        while pos < len(buf):
+            wd, mask, cookie, size = struct.unpack_from('iIII',buf,pos)
+            pos += struct.calcsize('iIII')
+            name = buf[pos:pos+size].rstrip(b'\0').decode('utf-8','replace')
+            pos += size
+            path = os.path.join(self.dirs.get(wd,''),name)
+            if path in self.files:
+                changed.add(self.files[path])
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+def get_watcher(filenames, poll=False, interval=0.5):
+    """ Watch files with inotify where available, else by polling. """
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(filenames)
+        except (OSError, AttributeError, TypeError) as e:
+            logging.info("Polling for changes (%s)"%e)
+    return PollWatcher(filenames, interval=interval)
+
+def watch(args, header='', poll=False, debounce=0.2, interval=0.5):
+    """ Regenerate the outputs whenever the input files change.
+
+    The input file, the auxiliary ordering file, and the output files
+    are watched. Changes are collected until no new change arrives for
+    'debounce' seconds, and the outputs are then regenerated. The
+    parsed table and the rendered entries are kept in memory between
+    regenerations: an unchanged csv file is not parsed again, and the
+    authors and affiliations whose rows and numbering are unchanged
+    reuse their rendered text (see Renderer.get_fragment). A removed
+    output file is written again. Outputs are only overwritten if they
+    are unchanged since mkauthlist last wrote them (or with '--force'),
+    so that hand edits are kept.
+
+    Parameters:
+    args     : parsed command line arguments (see get_parser)
+    header   : text to prepend to each author list
+    poll     : poll for changes instead of using inotify
+    debounce : quiet time before regenerating (s)
+    interval : polling interval (s)
+
+    Returns:
+    None (runs until interrupted)
+    """
+    if args.infile == '-':
+        raise ValueError("Standard input cannot be watched")
+    inputs = [args.infile]
+    if isinstance(args.aux,str):
+        inputs.append(args.aux)
+
+    tables, states = TableCache(maxsize=2), dict()
+    # Signatures of the output files as last written
+    owned = dict()
+    watcher, watched = None, None
+    try:
+        while True:
+            outfiles, written = [], dict()
+            read = dict((f,get_signature(f)) for f in inputs)
+            try:
+                outputs = make_outputs(args, header, tables=tables, states=states)
+                outfiles = [f for f in outputs if f is not None]
+                for outfile,parts in outputs.items():
+                    if outfile is None:
+                        write_outputs({outfile:parts})
+                        continue
+                    force = args.force or get_signature(outfile) == owned.get(outfile)
+                    sha = hashlib.sha1()
+                    write_outputs({outfile:iter_digest(parts,sha)}, force=force)
+                    written[outfile] = signature = get_signature(outfile)
+                    try:
+                        if get_file_hash(outfile) == sha.hexdigest():
+                            owned[outfile] = signature
+                    except OSError:
+                        # Removed meanwhile (see below)
+                        pass
+            except Exception as e:
+                # Keep watching (e.g., a partially edited csv file)
+                logging.error("%s: %s"%(type(e).__name__,e))
+
+            # Outputs removed as soon as they were written
+            removed = set(f for f,signature in written.items() if signature is None)
+            # Ignore the events of writing the outputs
+            written = dict((f,written.get(f,get_signature(f))) for f in outfiles
+                           if f not in removed)
+            if watched != inputs + outfiles:
+                if watcher is not None: watcher.close()
+                watched = inputs + outfiles
+                watcher = get_watcher(watched, poll=poll, interval=interval)
+
+            # Changes made before the watcher was started
+            signatures = dict(read)
+            signatures.update(written)
+            changed = set(f for f in watched if get_signature(f) != signatures.get(f))
+            changed |= removed
+            while True:
+                if not changed:
+                    changed = watcher.wait()
+                while True:
+                    more = watcher.wait(debounce)
+                    if not more: break
+                    changed |= more
+                changed = [f for f in changed if f not in written
+                           or get_signature(f) != written[f]]
+                if changed: break
+                changed = set()
+            logging.info("Changed: %s"%', '.join(sorted(changed)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None: watcher.close()
+
+### FETCH ###
+# PubDB-style endpoint: '{paper}' is replaced by the paper id
+PUBDB_ENDPOINT = os.environ.get('MKAUTHLIST_PUBDB_URL')
+
+def get_fetch_cache():
+    """ Default directory of the downloaded author lists. """
+    default = os.path.join(os.path.expanduser('~'),'.cache','mkauthlist','pubdb')
+    return os.environ.get('MKAUTHLIST_FETCH_CACHE',default)
+
+class PubDBClient(object):
+    """ Download author lists from a PubDB-style HTTP endpoint.
+
+    Connections are kept open and reused for the following requests to
+    the same host (one pool of idle connections per host, shared by all
+    threads). Downloads are stored in a cache directory together with
+    their 'ETag' and 'Last-Modified' headers, and are revalidated with a
+    conditional request ('If-None-Match', 'If-Modified-Since'), so an
+    unchanged author list is never downloaded again.
+    """
+    def __init__(self, endpoint=None, cachedir=None, timeout=30):
+        self.endpoint = endpoint or PUBDB_ENDPOINT
+        self.cachedir = cachedir or get_fetch_cache()
+        self.timeout = timeout
+        self.pool = dict()
+        self.lock = threading.Lock()
+
+    def get_url(self, paper):
+        """ URL of the author list of a paper (or the paper if it is a URL). """
+        if paper.startswith(('http://','https://')):
+            return paper
+        if not self.endpoint:
+            msg = "No PubDB endpoint (use '--endpoint' or $MKAUTHLIST_PUBDB_URL)"
+            raise ValueError(msg)
+        if '{paper}' in self.endpoint:
+            return self.endpoint.replace('{paper}',paper)
+        return self.endpoint.rstrip('/') + '/%s_author_list.csv'%paper
+
+    def get_connection(self, scheme, netloc):
+        """ Take an idle connection from the pool (or open a new one). """
+        import http.client
+        with self.lock:
+            idle = self.pool.get((scheme,netloc))
+            if idle:
+                return idle.pop(), True
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(netloc,timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(netloc,timeout=self.timeout)
+        return conn, False
+
+    def release(self, scheme, netloc, conn):
+        """ Return a connection to the pool. """
+        with self.lock:
+            self.pool.setdefault((scheme,netloc),[]).append(conn)
+
+    def request(self, url, headers=None, redirects=5):
+        """ GET a url over a pooled connection.
+
+        Returns:
+        status   : HTTP status code
+        response : response object (for the reason and the headers)
+        body     : response body (bytes)
+        """
+        import http.client
+        from urllib.parse import urlsplit, urljoin
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query: path += '?' + parts.query
+
+        conn, reused = self.get_connection(parts.scheme,parts.netloc)
+        try:
+            conn.request('GET',path,headers=headers or {})
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, ConnectionError) as e:
+            conn.close()
+            if not reused: raise
+            # The server closed an idle connection: retry on a new one
+            logging.debug("Reconnecting to %s (%s)"%(parts.netloc,e))
+            return self.request(url, headers, redirects)
+        except Exception:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.release(parts.scheme,parts.netloc,conn)
+
+        location = response.getheader('Location')
+        if response.status in (301,302,303,307,308) and location and redirects > 0:
+            return self.request(urljoin(url,location), headers, redirects-1)
+        return response.status, response, body
+
+    def get_cache_files(self, url):
+        """ Cached body and metadata files of a url. """
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cachedir,key)
+        return base + '.csv', base + '.json'
+
+    def fetch(self, paper):
+        """ Get the author list of a paper, revalidating the cached copy.
+
+        Parameters:
+        paper : paper id (e.g., 'DES-2015-0109') or url
+
+        Returns:
+        body   : content of the csv file (bytes)
+        status : 'downloaded' or 'not modified'
+        """
+        url = self.get_url(paper)
+        bodyfile, metafile = self.get_cache_files(url)
+        meta = dict()
+        if os.path.exists(bodyfile) and os.path.exists(metafile):
+            try:
+                with open(metafile,'r') as f:
+                    meta = json.load(f)
+            except ValueError:
+                logging.warn("Corrupt fetch cache: %s"%metafile)
+
+        headers = dict()
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        status, response, body = self.request(url,headers)
+        if status == 304 and meta:
+            with open(bodyfile,'rb') as f:
+                return f.read(), 'not modified'
+        if status != 200:
+            raise IOError("HTTP %i %s: %s"%(status,response.reason,url))
+
+        if not os.path.exists(self.cachedir):
+            os.makedirs(self.cachedir)
+        meta = dict(url=url, etag=response.getheader('ETag'),
+                    last_modified=response.getheader('Last-Modified'))
+        write_file(bodyfile,body)
+        write_file(metafile,json.dumps(meta).encode('utf-8'))
+        return body, 'downloaded'
+
+    def close(self):
+        """ Close the idle connections. """
+        with self.lock:
+            for conns in self.pool.values():
+                for conn in conns:
+                    conn.close()
+            self.pool.clear()
+
+def fetch(papers, outdir='.', endpoint=None, cachedir=None, jobs=1, timeout=30):
+    """ Download the author lists of several papers.
+
+    Each author list is written to '<outdir>/<paper>_author_list.csv'.
+    Files whose content is unchanged are not rewritten, so their
+    modification time (and any table or output cache) stays valid.
+
+    Parameters:
+    papers   : list of paper ids or urls
+    outdir   : output directory
+    endpoint : PubDB-style url (see PubDBClient)
+    cachedir : download cache directory
+    jobs     : number of parallel downloads
+    timeout  : connection timeout (s)
+
+    Returns:
+    results : list of (paper, filename, status, error) for each paper
+    """
+    client = PubDBClient(endpoint=endpoint, cachedir=cachedir, timeout=timeout)
+
+    def fetch_paper(paper):
+        name = paper
+        if paper.startswith(('http://','https://')):
+            from urllib.parse import urlsplit
+            name = os.path.basename(urlsplit(paper).path) or 'index'
+        name = os.path.splitext(name)[0]
+        if not name.endswith('_author_list'):
+            name += '_author_list'
+        filename = os.path.join(outdir,name+'.csv')
+        try:
+            body, status = client.fetch(paper)
+        except Exception as e:
+            return paper, filename, 'failed', "%s: %s"%(type(e).__name__,e)
+
+        if os.path.exists(filename):
+            with open(filename,'rb') as f:
+                if f.read() == body:
+                    return paper, filename, status, None
+        write_file(filename,body)
+        return paper, filename, status, None
+
+    if outdir and not os.path.exists(outdir):
+        os.makedirs(outdir)
+    try:
+        if jobs > 1 and len(papers) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(fetch_paper,papers))
+        else:
+            results = [fetch_paper(p) for p in papers]
+    finally:
+        client.close()
+    return results
+
+def get_fetch_parser():
+    """ Build the argument parser of 'mkauthlist fetch'. """
+    parser = argparse.ArgumentParser(prog='mkauthlist fetch',
+                                     description=fetch.__doc__.split('\n\n')[0])
+    parser.add_argument('papers', nargs='+', metavar='DES-XXXX-XXXX',
+                        help="paper ids (or urls of author list csv files).")
+    parser.add_argument('-o','--outdir', default='.',
+                        help="output directory.")
+    parser.add_argument('--endpoint', default=PUBDB_ENDPOINT,
+                        help="PubDB-style url; '{paper}' is replaced by the paper \
+                        id, else '/<paper>_author_list.csv' is appended \
+                        (default: $MKAUTHLIST_PUBDB_URL).")
+    parser.add_argument('--cache-dir', metavar='DIR', default=get_fetch_cache(),
+                        help="cache of the downloads (default: $MKAUTHLIST_FETCH_CACHE \
+                        or ~/.cache/mkauthlist/pubdb).")
+    parser.add_argument('--jobs', default=4, type=int,
+                        help="number of parallel downloads.")
+    parser.add_argument('--timeout', default=30, type=float,
+                        help="connection timeout (s).")
+    parser.add_argument('-v','--verbose', action='count', default=0,
+                        help="verbose output.")
+    return parser
+
+### SERVER ###
+class TableCache(object):
+    """ Thread-safe LRU cache of parsed author tables.
+
+    Tables are keyed by a hash of their content, so the same author
+    list is only parsed once however it is submitted.
+    """
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.tables = odict()
+        self.lock = threading.Lock()
+
+    def get(self, key, loader):
+        """ Get a table, calling 'loader()' to parse it if not cached. """
+        with self.lock:
+            if key in self.tables:
+                self.tables.move_to_end(key)
+                return self.tables[key]
+        # Parse outside of the lock
+        data = loader()
+        with self.lock:
+            self.tables[key] = data
+            while len(self.tables) > self.maxsize:
+                self.tables.popitem(last=False)
+        return data
+
+# Request options of the server (see parse_request)
+SERVE_OPTIONS = odict([
+    ('journal',str), ('doc',bool), ('orcid',bool), ('idx',int),
+    ('sort',bool), ('sort_builder',bool), ('sort_nonbuilder',bool),
+    ('collab',str), ('aux',str), ('path',str),
+])
 
-    ### ARXIV ###
-    if cls in ['arxiv']:
-        document = arxiv_document
-        if args.sort:
-            authlist = '%(collaboration)s: ' + arxiv_authlist
+def parse_request(query):
+    """ Parse the options of a render request.
+
+    Parameters:
+    query : url query string (e.g., 'journal=mnras&sort=1')
+
+    Returns:
+    options : dictionary of options (see SERVE_OPTIONS)
+    """
+    from urllib.parse import parse_qsl
+    options = dict(journal='apj', doc=False, orcid=False, idx=1, sort=False,
+                   sort_builder=False, sort_nonbuilder=False,
+                   collab=defaults['collaboration'], aux=None, path=None)
+    for key,value in parse_qsl(query, keep_blank_values=True):
+        key = key.replace('-','_')
+        if key not in SERVE_OPTIONS:
+            raise ValueError("Unrecognized option: %s"%key)
+        dtype = SERVE_OPTIONS[key]
+        if dtype is bool:
+            value = value.lower() not in ['0','false','no']
         else:
-            authlist = arxiv_authlist + ' (%(collaboration)s)'
-
-        for i,d in enumerate(data):
-            if d['Authorname'] == '':
-                logging.warn("Blank authorname for '%s %s'"%(d['Firstname'],
-                                                             d['Lastname']))
-            if (d['Affiliation'] not in affidict.keys()):
-                affidict[d['Affiliation']] = len(affidict.keys())
-            affidx = affidict[d['Affiliation']]
-
-            if d['Authorname'] not in authdict.keys():
-                authdict[d['Authorname']] = [affidx]
-            else:
-                authdict[d['Authorname']].append(affidx)
+            value = dtype(value)
+        options[key] = value
+    get_renderer(options['journal'])
+    return options
+
+def get_server_path(root, path):
+    """ Resolve a file name of a request under the server root.
+
+    Parameters:
+    root : directory of the files that requests may read (None if
+           requests may not read files)
+    path : file name relative to the root
+
+    Returns:
+    path : absolute file name
+    """
+    if root is None:
+        raise PermissionError("Reading files is disabled (see '--root')")
+    root = os.path.realpath(root)
+    filename = os.path.realpath(os.path.join(root,path))
+    if os.path.commonpath([root,filename]) != root:
+        raise PermissionError("Not under the server root: %s"%path)
+    return filename
+
+def render_request(tables, options, body=None, root=None):
+    """ Render the author list of one server request.
+
+    Parameters:
+    tables  : parsed tables (TableCache)
+    options : request options (see parse_request)
+    body    : uploaded csv file (bytes), if no 'path' option is given
+    root    : directory of the 'path' and 'aux' files (see get_server_path)
+
+    Returns:
+    output : the latex author list (or document)
+    """
+    path, aux = options['path'], options['aux']
+    if aux is not None:
+        aux = get_server_path(root, aux)
+    if path is not None:
+        path = get_server_path(root, path)
+        key = get_file_hash(path)
+        data = tables.get(key, lambda: load(path))
+    else:
+        if not body:
+            raise ValueError("No csv file or path")
+        import io
+        key = hashlib.sha1(body).hexdigest()
+        text = body.decode('utf-8')
+        data = tables.get(key, lambda: parse_csv(io.StringIO(text),'<upload>'))
+
+    data = order(data, sort=options['sort'], sort_builder=options['sort_builder'],
+                 sort_nonbuilder=options['sort_nonbuilder'], aux=aux)
+    return render(data, journal=options['journal'], doc=options['doc'],
+                  orcid=options['orcid'], idx=options['idx'], sort=options['sort'],
+                  collaboration=options['collab'])
+
+def get_request_handler():
+    """ Build the HTTP request handler class of the server. """
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import urlsplit
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        """ Render author lists for 'GET' and 'POST' requests to '/render'.
+
+        Options are passed in the query string and the csv file is
+        either uploaded as the request body or read from 'path'.
+        """
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.handle_render()
+
+        def do_POST(self):
+            self.handle_render()
+
+        def handle_render(self):
+            url = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else None
+            if url.path != '/render':
+                self.send_error(404, "Unknown path: %s"%url.path)
+                return
+
+            try:
+                options = parse_request(url.query)
+                output = render_request(self.server.tables, options, body,
+                                        root=self.server.root)
+                status = 200
+            except PermissionError as e:
+                status, output = 403, "%s\n"%e
+            except (IOError, OSError) as e:
+                status, output = 404, "%s\n"%e
+            except Exception as e:
+                status, output = 400, "%s: %s\n"%(type(e).__name__,e)
+
+            content = output.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type','text/plain; charset=utf-8')
+            self.send_header('Content-Length',str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def address_string(self):
+            # Unix socket clients have no address
+            if isinstance(self.client_address,tuple):
+                return self.client_address[0]
+            return 'local'
+
+        def log_message(self, format, *args):
+            logging.info("%s %s"%(self.address_string(),format%args))
+
+    return RequestHandler
+
+def make_server(host='127.0.0.1', port=8000, socket=None, maxtables=32, root=None):
+    """ Create the rendering server (see serve).
+
+    Returns:
+    server : threading HTTP server with a 'tables' cache and a 'root'
+    """
+    import socketserver
+    from http.server import ThreadingHTTPServer
+    handler = get_request_handler()
+    if socket is not None:
+        class UnixServer(socketserver.ThreadingMixIn,socketserver.UnixStreamServer):
+            daemon_threads = True
+        if os.path.exists(socket):
+            os.remove(socket)
+        server = UnixServer(socket, handler)
+    else:
+        server = ThreadingHTTPServer((host,port), handler)
+        server.daemon_threads = True
+    server.tables = TableCache(maxtables)
+    server.root = root
+    return server
+
+def serve(host='127.0.0.1', port=8000, socket=None, maxtables=32, root=None):
+    """ Render author lists for local HTTP requests until interrupted.
+
+    The interpreter, numpy, the journal templates, and the recently
+    parsed author tables stay loaded between requests, so a request
+    costs little more than the rendering itself. Each request is
+    handled in its own thread.
+
+    Requests are 'POST /render?journal=mnras&sort=1' with the csv file
+    as the body. The other options are 'doc', 'orcid', 'idx',
+    'sort_builder', 'sort_nonbuilder', and 'collab'. If a root
+    directory is given, requests may also read the csv file
+    ('GET /render?path=author_list.csv&journal=mnras') and the ordering
+    file ('aux') from under the root; other files are refused (403).
+
+    Parameters:
+    host      : address to listen on
+    port      : port to listen on (0 for any free port)
+    socket    : listen on this Unix socket instead
+    maxtables : number of parsed tables to keep
+    root      : directory of the files that requests may read (None
+                if requests may not read files)
+
+    Returns:
+    None
+    """
+    # Warm up: load numpy and the csv parser, and render a document
+    # with each renderer (which reads its templates)
+    import io
+    text = 'Lastname,Firstname,Authorname,JoinedAsBuilder,Affiliation\nA,B,B.~A,True,C\n'
+    data = parse_csv(io.StringIO(text),'<warm-up>')
+    for journal in get_journals():
+        render(data, journal=journal, doc=True)
+
+    server = make_server(host=host, port=port, socket=socket, maxtables=maxtables,
+                         root=root)
+    if socket is not None:
+        address = 'unix:%s'%socket
+    else:
+        address = 'http://%s:%i'%server.server_address[:2]
+    print("Serving on %s"%address)
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket is not None and os.path.exists(socket):
+            os.remove(socket)
+
+def get_serve_parser():
+    """ Build the argument parser of 'mkauthlist serve'. """
+    parser = argparse.ArgumentParser(prog='mkauthlist serve',
+                                     description=serve.__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address to listen on.")
+    parser.add_argument('--port', default=8000, type=int,
+                        help="port to listen on (0 for any free port).")
+    parser.add_argument('--socket', metavar='PATH',
+                        help="listen on a Unix socket instead.")
+    parser.add_argument('--max-tables', default=32, type=int,
+                        help="number of parsed author tables to keep.")
+    parser.add_argument('--root', metavar='DIR',
+                        help="allow requests to read csv and ordering files \
+                        ('path' and 'aux') under this directory (disabled by default).")
+    parser.add_argument('-v','--verbose', action='count', default=0,
+                        help="verbose output.")
+    return parser
+
+def main(argv=None):
+    """ Command line interface. """
+    if argv is None: argv = sys.argv[1:]
+    command = argv[0] if argv[:1] in (['serve'],['fetch']) else None
+    if command == 'serve':
+        parser = get_serve_parser()
+        args = parser.parse_args(argv[1:])
+    elif command == 'fetch':
+        parser = get_fetch_parser()
+        args = parser.parse_args(argv[1:])
+    else:
+        parser = get_parser()
+        args = parser.parse_args(argv)
 
-        authors=[]
-        for k,v in authdict.items():
-            author = re.sub(r'(?<!\\)~',' ',k).replace(r'\ ',' ').replace('{','').replace('}','')
-            authors.append(author)
+    if args.verbose == 1: level = logging.INFO
+    elif args.verbose >= 2: level = logging.DEBUG
+    else: level = logging.WARNING
+    logging.basicConfig(format="%% %(levelname)s: %(message)s", level=level)
 
-        params = dict(defaults,authors=', '.join(authors).strip(','),affiliations='')
+    if command == 'serve':
+        serve(host=args.host, port=args.port, socket=args.socket,
+              maxtables=args.max_tables, root=args.root)
+        return 0
+
+    if command == 'fetch':
+        results = fetch(args.papers, outdir=args.outdir, endpoint=args.endpoint,
+                        cachedir=args.cache_dir, jobs=args.jobs, timeout=args.timeout)
+        nfail = 0
+        for paper,filename,status,error in results:
+            if error is None:
+                print("%-12s  %s"%(status,filename))
+            else:
+                nfail += 1
+                print("  FAILED      %s (%s)"%(paper,error))
+        return 1 if nfail else 0
 
-    output  = "%% Author list file generated with: %s %s \n"%(parser.prog, __version__ )
-    output += "%% %s %s \n"%(os.path.basename(sys.argv[0]),' '.join(sys.argv[1:]))
+    if args.watch:
+        watch(args,get_header(parser.prog,argv),poll=args.poll)
+        return 0
 
-    if args.doc:
-        params['authlist'] = authlist%params
-        output += document%params
-    else:
-        output += authlist%params
+    if args.batch:
+        papers = get_batch(args,parser)
+        nfail = run_batch(papers,prog=parser.prog,jobs=args.jobs)
+        return 1 if nfail else 0
 
-    if args.outfile is None:
-        print(output)
-    else:
-        outfile = args.outfile
-        if os.path.exists(outfile) and not args.force:
-            logging.warn("Found %s; skipping..."%outfile)
-        out = open(outfile,'w')
-        out.write(output)
-        out.close()
+    run(args,get_header(parser.prog,argv))
 
-    if args.cntrb:
-        write_contributions(args.cntrb,data)
+if __name__ == "__main__":
+    sys.exit(main())
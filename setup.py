@@ -5,8 +5,8 @@ except ImportError: from distutils.core import setup
 
 import versioneer
 
-if sys.version_info[:2] < (2, 7):
-    raise RuntimeError("Python version >= 2.7 required.")
+if sys.version_info[:2] < (3, 8):
+    raise RuntimeError("Python version >= 3.8 required.")
 
 setup(
     name='mkauthlist',
@@ -20,13 +20,19 @@ setup(
     license='MIT',
     scripts = ['bin/mkauthlist'],
     packages = ['mkauthlist'],
+    python_requires='>=3.8',
+    package_data = {'mkauthlist': ['templates/*.tex']},
     install_requires=[
         'numpy >= 1.6.1',
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
     platforms='any',
     keywords='latex des',
     classifiers = [
         'Programming Language :: Python',
+        'Programming Language :: Python :: 3',
         'Development Status :: 4 - Beta',
         'Natural Language :: English',
         'Intended Audience :: Science/Research',
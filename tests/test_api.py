@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+"""
+Test the library interface.
+"""
+__author__ = "Alex Drlica-Wagner"
+import os
+import io
+import csv
+import time
+import shutil
+import subprocess
+import unittest
+
+import numpy as np
+
+import mkauthlist
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Generous upper bound on the time of the umlaut check relative to
+# parsing the same lines with the csv reader
+MAX_UMLAUT_RATIO = 3
+
+class TestAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.csv = os.path.join('data','example_author_list.csv')
+        self.order = os.path.join('data','author_order.csv')
+
+    def cli(self, opts):
+        """ Run the command line tool and strip the header lines. """
+        cmd = "mkauthlist %s %s"%(opts,self.csv)
+        print(cmd)
+        out = subprocess.check_output(cmd,shell=True,universal_newlines=True)
+        # Strip the two header lines and the trailing print newline
+        return out.split('\n',2)[-1][:-1]
+
+    def test_load(self):
+        """Load the author list."""
+        data = mkauthlist.load(self.csv)
+        self.assertEqual(len(data),70)
+        self.assertEqual(data['Authorname'][0],'P.~Melchior')
+
+    def test_order(self):
+        """Order the author list without changing the input."""
+        data = mkauthlist.load(self.csv)
+        ordered = mkauthlist.order(data,sort=True,aux=self.order)
+        self.assertEqual(ordered['Authorname'][0],'P.~Melchior')
+        self.assertEqual(ordered['Authorname'][-1],'Y.~Zhang')
+        self.assertEqual(data['Authorname'][-1],'T.~M.~C.~Abbott')
+
+    def test_render(self):
+        """Render the same output as the command line tool."""
+        data = mkauthlist.load(self.csv)
+        for journal in ['apj','revtex','aastex5','mnras','elsevier','arxiv']:
+            output = mkauthlist.render(data,journal=journal)
+            self.assertEqual(output,self.cli('-j %s'%journal))
+
+        data = mkauthlist.order(data,sort=True)
+        output = mkauthlist.render(data,journal='arxiv',sort=True,
+                                   collaboration='Foo')
+        self.assertTrue(output.startswith('Foo: T. M. C. Abbott'))
+
+    def test_authors(self):
+        """Render from the author records."""
+        data = mkauthlist.order(mkauthlist.load(self.csv),sort=True)
+        authors = mkauthlist.get_authors(data)
+        self.assertEqual(len(authors),len(data))
+        self.assertEqual(authors[0].authorname,data['Authorname'][0])
+        self.assertEqual(authors[0].affiliation.name,data['Affiliation'][0])
+        # Authors with the same affiliation share it
+        fermilab = [a.affiliation for a in authors if 'Fermi' in a.affiliation.name]
+        self.assertTrue(all(a is fermilab[0] for a in fermilab))
+
+        for journal in ['apj','revtex','aastex7','mnras','elsevier','arxiv']:
+            self.assertEqual(mkauthlist.render(authors,journal=journal,orcid=True),
+                             mkauthlist.render(data,journal=journal,orcid=True))
+        # Any subset or reordering of the records can be rendered
+        authors = authors[::-1]
+        output = mkauthlist.render(authors,journal='mnras')
+        self.assertIn('\n%s,$^{1}$\n'%authors[0].authorname,output)
+
+    def test_affiliation_codes(self):
+        """Number the affiliations by their codes."""
+        Author, Affiliation = mkauthlist.Author, mkauthlist.Affiliation
+        # Codes out of order, and one name under two codes
+        affs = [Affiliation('Fermilab',5),Affiliation('SLAC',2),Affiliation('Fermilab',7)]
+        authors = [Author('A%i'%i,'B','C%i'%i,aff,None,None,None)
+                   for i,aff in enumerate(affs+[affs[1],affs[0]])]
+        affidx,names = mkauthlist.mkauthlist.get_affiliations(authors)
+        self.assertEqual(affidx,[0,1,2,1,0])
+        self.assertEqual(names,['Fermilab','SLAC','Fermilab'])
+
+        # Same numbering from the 'AffiliationID' column of a table
+        data = mkauthlist.load(self.csv)[:5]
+        data['Affiliation'] = [a.name for a in affs+[affs[1],affs[0]]]
+        data['AffiliationID'] = [a.code for a in affs+[affs[1],affs[0]]]
+        output = mkauthlist.render(data,journal='elsevier')
+        addresses = [l for l in output.splitlines() if l.startswith(r'\address')]
+        self.assertEqual(addresses,[r'\address[1]{Fermilab}',r'\address[2]{SLAC}',
+                                    r'\address[3]{Fermilab}'])
+
+        # Without an 'AffiliationID' column, affiliations are merged by name
+        data = np.rec.fromrecords([('Doe','Jane','J.~Doe','Fermilab'),
+                                   ('Roe','Rick','R.~Roe','SLAC'),
+                                   ('Poe','Paul','P.~Poe','Fermilab')],
+                                  names=['Lastname','Firstname','Authorname','Affiliation'])
+        output = mkauthlist.render(data,journal='mnras')
+        self.assertIn(r'$^{1}$ Fermilab\\',output)
+        self.assertIn(r'$^{2}$ SLAC\\',output)
+        self.assertNotIn(r'$^{3}$',output)
+
+    def test_register_renderer(self):
+        """Register a renderer for a new journal."""
+        @mkauthlist.register_renderer
+        class ShoutRenderer(mkauthlist.get_renderer('mnras')):
+            name = 'shout'
+            authlist = 'mnras_authlist'
+            document = 'mnras_document'
+            def get_params(self, authors):
+                params = super(ShoutRenderer,self).get_params(authors)
+                params['authors'] = (a.upper() for a in params['authors'])
+                return params
+
+        self.assertIs(mkauthlist.get_renderer('shout'),ShoutRenderer)
+        data = mkauthlist.load(self.csv)
+        output = mkauthlist.render(data,journal='shout')
+        self.assertIn('P.~MELCHIOR',output)
+        self.assertEqual(output.lower(),
+                         mkauthlist.render(data,journal='mnras').lower())
+        with self.assertRaises(ValueError):
+            mkauthlist.render(data,journal='nature')
+
+    def test_stream(self):
+        """Write the rendered output to a stream."""
+        data = mkauthlist.load(self.csv)
+        stream = io.StringIO()
+        output = mkauthlist.render(data,journal='mnras',stream=stream)
+        self.assertEqual(stream.getvalue(),output)
+
+    def test_iter_render(self):
+        """Render an author list piece by piece."""
+        data = mkauthlist.load(self.csv)
+        for journal in ['apj','aastex7','mnras','aanda','elsevier','arxiv']:
+            for doc in [False,True]:
+                fragments = list(mkauthlist.iter_render(data,journal=journal,doc=doc))
+                output = mkauthlist.render(data,journal=journal,doc=doc)
+                self.assertEqual(''.join(fragments),output)
+                if journal != 'arxiv':
+                    self.assertGreater(len(fragments),len(data)//2)
+
+                stream = io.StringIO()
+                mkauthlist.write_fragments(stream,fragments,bufsize=100)
+                self.assertEqual(stream.getvalue(),output)
+
+    def test_threads(self):
+        """Render different papers concurrently in threads."""
+        from concurrent.futures import ThreadPoolExecutor
+        data = mkauthlist.load(self.csv)
+        authors = mkauthlist.get_authors(data)
+        configs = []
+        for i in range(20):
+            journal = ['apj','revtex','aastex7','mnras','aanda','elsevier','arxiv'][i%7]
+            configs.append(mkauthlist.RenderConfig(journal=journal,doc=bool(i%2),
+                                                   idx=i%3+1,sort=bool(i%5),
+                                                   collaboration='Collab%02i'%i))
+        expected = [mkauthlist.render(authors,config=c) for c in configs]
+
+        def render(i):
+            # Share the author records, or build them in each thread
+            source = authors if i%2 else data
+            return mkauthlist.render(source,config=configs[i%len(configs)])
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            outputs = list(executor.map(render,range(20*len(configs))))
+
+        for i,output in enumerate(outputs):
+            config = configs[i%len(configs)]
+            self.assertEqual(output,expected[i%len(configs)])
+            others = [c.collaboration for c in configs if c != config]
+            self.assertFalse(any(c in output for c in others))
+
+        # Keyword options replace the values of the config
+        config = configs[3]
+        self.assertEqual(mkauthlist.render(authors,config=config,collaboration='Other'),
+                         mkauthlist.render(authors,config=config._replace(collaboration='Other')))
+
+    def test_abstract(self):
+        """Keep '%' in the abstract of a standalone document."""
+        data = mkauthlist.load(self.csv)
+        output = mkauthlist.render(data,doc=True)
+        self.assertIn('created by \\texttt{mkauthlist.py v%s}'%mkauthlist.get_version(),output)
+        for journal in ['apj','revtex','aastex7','mnras','aanda','elsevier']:
+            config = mkauthlist.RenderConfig(journal=journal,doc=True,
+                                             abstract=r'100\% of %(prog)s')
+            output = mkauthlist.render(data,config=config)
+            self.assertIn(r'100\% of %(prog)s',output)
+
+    def test_async(self):
+        """Render author lists from an asyncio event loop."""
+        import asyncio
+        data = mkauthlist.load(self.csv)
+        expected = mkauthlist.render(mkauthlist.order(data,sort=True),journal='mnras')
+
+        async def render():
+            ticks = 0
+            task = asyncio.ensure_future(mkauthlist.arender(self.csv,journal='mnras',sort=True))
+            while not task.done():
+                # The event loop keeps running while the list is rendered
+                ticks += 1
+                await asyncio.sleep(0)
+            return await task, ticks
+        output,ticks = asyncio.run(render())
+        self.assertEqual(output,expected)
+        self.assertGreater(ticks,1)
+
+        journals = ['apj','revtex','mnras','elsevier','arxiv','nature']
+        requests = [(self.csv,dict(journal=j,collaboration=j)) for j in journals]
+        requests.append((data,dict(journal='aanda')))
+
+        async def batch():
+            results = []
+            for result in mkauthlist.arender_as_completed(requests,limit=2):
+                results.append(await result)
+            return results
+        results = sorted(asyncio.run(batch()),key=lambda r: r[0])
+
+        self.assertEqual([r[0] for r in results],list(range(len(requests))))
+        for (index,output,error),(source,options) in zip(results,requests):
+            if options['journal'] == 'nature':
+                self.assertIsInstance(error,ValueError)
+                continue
+            self.assertIsNone(error)
+            self.assertEqual(output,mkauthlist.render(data,**options))
+
+    def test_write_outputs(self):
+        """Replace output files in one step."""
+        write_outputs = mkauthlist.mkauthlist.write_outputs
+        outdir = 'write_outputs'
+        os.makedirs(outdir)
+        outfile = os.path.join(outdir,'output.tex')
+        write_outputs({outfile:['old']})
+
+        # A reader of the previous file never sees a partial file
+        with open(outfile) as reader:
+            write_outputs({outfile:['new ',(str(i) for i in range(10))]},force=True)
+            self.assertEqual(reader.read(),'old')
+        with open(outfile) as f:
+            self.assertEqual(f.read(),'new 0123456789')
+
+        # A failed write leaves no partial (or temporary) file behind
+        newfile = os.path.join(outdir,'new.tex')
+        def fail():
+            yield 'partial'
+            raise RuntimeError("rendering failed")
+        with self.assertRaises(RuntimeError):
+            write_outputs({newfile:['new',fail()]})
+        self.assertEqual(os.listdir(outdir),['output.tex'])
+        shutil.rmtree(outdir)
+
+    def test_umlaut_speed(self):
+        """Check for umlauts at about the cost of parsing the csv file."""
+        check_umlaut = mkauthlist.mkauthlist.check_umlaut
+        with open(self.csv) as f:
+            lines = f.readlines()
+        lines = lines[:1] + lines[1:]*1000
+
+        def best(func, repeat=3):
+            times = []
+            for i in range(repeat):
+                start = time.time()
+                for item in func(): pass
+                times.append(time.time()-start)
+            return min(times)
+
+        reader = best(lambda: csv.reader(lines,skipinitialspace=True))
+        check = best(lambda: check_umlaut(lines,warn=lambda msg: None))
+        self.assertLess(check,MAX_UMLAUT_RATIO*reader)
+
+    def test_table_cache(self):
+        """Reload the author list from the binary table cache."""
+        csv = 'cache_author_list.csv'
+        shutil.copy(self.csv,csv)
+        cachefile = csv + '.npz'
+
+        data = mkauthlist.load(csv,cache=True)
+        self.assertTrue(os.path.exists(cachefile))
+        cached = mkauthlist.load(csv,cache=True)
+        self.assertEqual(data.dtype.names,cached.dtype.names)
+        for name in data.dtype.names:
+            np.testing.assert_array_equal(data[name],cached[name])
+        self.assertEqual(mkauthlist.render(data),mkauthlist.render(cached))
+
+        # Changing the csv file invalidates the cache
+        with open(csv,'a') as f:
+            f.write('Zwicky,Fritz,F.~Zwicky,True,"Caltech",,,\n')
+        data = mkauthlist.load(csv,cache=True)
+        self.assertEqual(data['Lastname'][-1],'Zwicky')
+        self.assertEqual(mkauthlist.load(csv,cache=True)['Lastname'][-1],'Zwicky')
+
+        os.remove(csv); os.remove(cachefile)
+
+    def test_mmap_crlf(self):
+        """Read CRLF files through the memory map like read_csv."""
+        csv = 'crlf_author_list.csv'
+        with open(self.csv,'r') as f:
+            lines = f.read().splitlines()
+        # Quoted newlines in records that need the csv reader fallback
+        lines += ['A,B,C,True,"Univ\r\nM\\"unchen",,,',
+                  'D,E,F,True,"Univ\nPhysics\rM\\"unchen",,,',
+                  'G,H,I,True,"Univ\r\nMunich",,,']
+        with open(csv,'w',newline='') as f:
+            f.write('\r\n'.join(lines)+'\r\n')
+
+        read_csv_mmap = mkauthlist.mkauthlist.read_csv_mmap
+        data = mkauthlist.mkauthlist.read_csv(csv)
+        mapped = read_csv_mmap(csv)
+        os.remove(csv)
+        self.assertEqual(data['Affiliation'][-1],'Univ\nMunich')
+        self.assertFalse(any('\r' in a for a in data['Affiliation']))
+        for name in data.dtype.names:
+            self.assertEqual(list(mapped[name]),list(data[name]))
+
+    def test_parallel_read(self):
+        """Parse record-aligned chunks in parallel."""
+        csv = 'parallel_author_list.csv'
+        with open(self.csv,'r') as f:
+            lines = f.read().splitlines(True)
+        # Comments, blank lines, and quoted newlines across the chunks
+        lines[10:10] = ['# A comment, "quoted"\n','\n']
+        lines += ['Zwicky,Fritz,F.~Zwicky,True,"Caltech,\nPasadena",,,\n']*5
+
+        read_csv_mmap = mkauthlist.mkauthlist.read_csv_mmap
+        for newline in ['\n','\r\n']:
+            with open(csv,'w',newline='') as f:
+                f.write(''.join(lines).replace('\n',newline))
+            for irregular in [False, True]:
+                if irregular:
+                    # Unescaped umlauts and literal quotes, and quoted
+                    # newlines in records that need the csv reader
+                    extra = ['Gruen,Daniel,D.~Gr\\"un,True,"Universit\\"at",,,\n',
+                             'A,B,C,True,"Univ\nM\\"unchen",,,\n']
+                    with open(csv,'a',newline='') as f:
+                        f.write(''.join(extra+lines[1:]).replace('\n',newline))
+                data = mkauthlist.load(csv)
+                for columns in [None, ['Authorname','JoinedAsBuilder']]:
+                    chunked = read_csv_mmap(csv,columns,jobs=3,chunksize=100)
+                    for name in chunked.dtype.names:
+                        self.assertEqual(list(chunked[name]),list(data[name]))
+        os.remove(csv)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed")
+    def test_arrow(self):
+        """Round trip the author table through Parquet and Feather."""
+        data = mkauthlist.load(self.csv)
+        for filename in ['test_table.parquet','test_table.feather']:
+            mkauthlist.write_table(filename,data)
+            table = mkauthlist.load(filename)
+            os.remove(filename)
+            self.assertEqual(table.dtype.names,data.dtype.names)
+            for name in data.dtype.names:
+                self.assertEqual(list(table[name]),list(data[name]))
+
+        # Plain (not dictionary encoded) columns of other types
+        columns = dict((n,list(data[n])) for n in data.dtype.names[:-1])
+        columns['JoinedAsBuilder'] = [v == 'True' for v in columns['JoinedAsBuilder']]
+        columns['ORCID'] = [v or None for v in columns['ORCID']]
+        table = mkauthlist.from_arrow(pyarrow.table(columns))
+        self.assertEqual(mkauthlist.render(table),mkauthlist.render(data))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,8 +7,14 @@ import os
 import shutil
 import logging
 import subprocess
+import time
 import unittest
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 class TestAuthlist(unittest.TestCase):
 
     def setUp(self):
@@ -144,6 +150,315 @@ class TestAuthlist(unittest.TestCase):
             self.assertEqual(authors[-1],'\\author{T.~M.~C.~Abbott}\n')
             self.assertEqual(authors[4],'\\author{Y.~Zhang}\n')
 
+    def test_umlaut(self):
+        """Warn about every unescaped umlaut in quoted fields."""
+        umlaut = 'umlaut_author_list.csv'
+        with open(self.csv,'r') as f:
+            header = f.readline()
+        with open(umlaut,'w') as f:
+            f.write(header)
+            f.write('Gruen,Daniel,D.~Gr\\"un,True,"Universit\\"at M\\"unchen",,,\n')
+            f.write('Gruen,Daniel,D.~Gr\\"un,True,"Universit\\""at",,,\n')
+
+        cmd = "mkauthlist -f %s %s"%(umlaut,self.tex)
+        print(cmd)
+        out = subprocess.run(cmd,shell=True,stderr=subprocess.PIPE,
+                             universal_newlines=True)
+        os.remove(umlaut)
+
+        warnings = [l for l in out.stderr.splitlines() if 'unescaped umlaut' in l]
+        self.assertEqual(len(warnings),2)
+        self.assertIn('(line 2, column 39)',warnings[0])
+        self.assertIn('(line 2, column 45)',warnings[1])
+
+    def test_multi_journal(self):
+        """Write several journals from one run."""
+        journals = ['apj','mnras','arxiv']
+        cmd = "mkauthlist -f -j %s --jobs 2 %s %s"%(','.join(journals),self.csv,self.tex)
+        print(cmd)
+        subprocess.check_output(cmd,shell=True)
+
+        for journal in journals:
+            filename = self.tex.replace('.tex','_%s.tex'%journal)
+            with open(filename,'r') as f:
+                multi = f.readlines()[2:]
+            os.remove(filename)
+
+            cmd = "mkauthlist -f -j %s %s %s"%(journal,self.csv,self.tex)
+            print(cmd)
+            subprocess.check_output(cmd,shell=True)
+            with open(self.tex,'r') as f:
+                single = f.readlines()[2:]
+            self.assertEqual(multi,single)
+
+    def test_all_journals(self):
+        """Write one file for each document class."""
+        cmd = "mkauthlist -f --all-journals %s %s"%(self.csv,self.tex)
+        print(cmd)
+        subprocess.check_output(cmd,shell=True)
+        base = self.tex.replace('.tex','')
+        for journal in ['aastex6','revtex','aastex5','aastex7','mnras',
+                        'elsevier','emulateapj','arxiv','aanda']:
+            filename = '%s_%s.tex'%(base,journal)
+            self.assertTrue(os.path.exists(filename),filename)
+            os.remove(filename)
+        self.assertFalse(os.path.exists(base+'_tex.tex'))
+
+        # Journals of the same document class are only rendered once
+        cmd = "mkauthlist -f -j apj,aastex %s %s"%(self.csv,self.tex)
+        print(cmd)
+        subprocess.check_output(cmd,shell=True)
+        self.assertTrue(os.path.exists(self.tex))
+        self.assertFalse(os.path.exists(base+'_apj.tex'))
+        self.assertFalse(os.path.exists(base+'_aastex.tex'))
+
+    def test_mmap(self):
+        """Read only the needed columns through a memory map."""
+        for journal in ['apj','aastex','revtex','elsevier','arxiv']:
+            cmd = "mkauthlist --orcid --cntrb -j %s %s"%(journal,self.csv)
+            print(cmd)
+            expected = subprocess.check_output(cmd,shell=True).splitlines()[2:]
+            with open(self.cntrb,'r') as f:
+                cntrb = f.read()
+            os.remove(self.cntrb)
+
+            cmd += " --mmap"
+            print(cmd)
+            output = subprocess.check_output(cmd,shell=True).splitlines()[2:]
+            self.assertEqual(output,expected)
+            with open(self.cntrb,'r') as f:
+                self.assertEqual(f.read(),cntrb)
+            os.remove(self.cntrb)
+
+    def test_compressed(self):
+        """Read compressed csv files and standard input."""
+        cmd = "mkauthlist -j mnras %s"%(self.csv)
+        print(cmd)
+        expected = subprocess.check_output(cmd,shell=True).splitlines()[2:]
+
+        for compress,ext in [('gzip','.gz'),('bzip2','.bz2'),('xz','.xz')]:
+            cmd = "%s -k %s"%(compress,self.csv)
+            print(cmd)
+            subprocess.check_output(cmd,shell=True)
+            cmd = "mkauthlist -j mnras %s"%(self.csv+ext)
+            print(cmd)
+            output = subprocess.check_output(cmd,shell=True).splitlines()[2:]
+            os.remove(self.csv+ext)
+            self.assertEqual(output,expected)
+
+        cmd = "cat %s | mkauthlist -j mnras -"%(self.csv)
+        print(cmd)
+        output = subprocess.check_output(cmd,shell=True).splitlines()[2:]
+        self.assertEqual(output,expected)
+
+    def test_renderer_plugin(self):
+        """Load a third-party renderer from an entry point."""
+        plugin = 'test_plugin'
+        distinfo = os.path.join(plugin,'mkauthlist_names-0.1.dist-info')
+        os.makedirs(distinfo)
+        with open(os.path.join(plugin,'mkauthlist_names.py'),'w') as f:
+            f.write("""
+import mkauthlist
+class NamesRenderer(mkauthlist.Renderer):
+    name = 'names'
+    journals = ['names','plain']
+    columns = []
+    def get_authlist(self):
+        return '%(authors)s'
+    def get_params(self, authors):
+        return dict(authors=';'.join(a.lastname for a in authors))
+""")
+        with open(os.path.join(distinfo,'METADATA'),'w') as f:
+            f.write('Metadata-Version: 2.1\nName: mkauthlist-names\nVersion: 0.1\n')
+        with open(os.path.join(distinfo,'entry_points.txt'),'w') as f:
+            f.write('[mkauthlist.renderers]\nnames = mkauthlist_names:NamesRenderer\n')
+
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([plugin,os.getcwd()])
+        cmd = "mkauthlist -j plain --mmap %s"%(self.csv)
+        print(cmd)
+        out = subprocess.check_output(cmd,shell=True,env=env,universal_newlines=True)
+        shutil.rmtree(plugin)
+        self.assertTrue(out.splitlines()[-1].startswith('Melchior;Drlica-Wagner;Rykoff;Rykoff;'))
+
+    def test_batch(self):
+        """Process a directory of author lists, skipping failures."""
+        indir, outdir = 'batch_input', 'batch_output'
+        # The output directory is created
+        os.makedirs(indir)
+        papers = ['DES-2020-0001_author_list','DES-2020-0002_author_list']
+        for paper in papers:
+            shutil.copy(self.csv,os.path.join(indir,paper+'.csv'))
+        with open(os.path.join(indir,'DES-2020-0003_author_list.csv'),'w') as f:
+            f.write('Lastname,Firstname\n')
+
+        cmd = "mkauthlist -f --batch --jobs 2 -j arxiv %s %s"%(indir,outdir)
+        print(cmd)
+        out = subprocess.run(cmd,shell=True,stdout=subprocess.PIPE,
+                             universal_newlines=True)
+        outfiles = sorted(os.listdir(outdir))
+        shutil.rmtree(indir); shutil.rmtree(outdir)
+
+        self.assertEqual(out.returncode,1)
+        self.assertEqual(outfiles,[p+'.tex' for p in papers])
+        self.assertIn('FAILED',out.stdout)
+        self.assertIn('Processed 3 files (1 failed)',out.stdout)
+
+    def test_batch_file(self):
+        """Skip the malformed lines of a batch file."""
+        batch, outfiles = 'batch.txt', ['batch1.tex','batch2.tex']
+        with open(batch,'w') as f:
+            f.write('%s %s -j mnras\n'%(self.csv,outfiles[0]))
+            f.write('%s bad.tex -j nature\n'%self.csv)
+            f.write('%s bad.tex --no-such-option\n'%self.csv)
+            f.write('%s "bad.tex\n'%self.csv)
+            f.write('%s %s -j arxiv # comment\n'%(self.csv,outfiles[1]))
+
+        cmd = "mkauthlist -f --batch %s"%batch
+        print(cmd)
+        out = subprocess.run(cmd,shell=True,stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE,universal_newlines=True)
+        exists = [os.path.exists(f) for f in outfiles+['bad.tex']]
+        for f in outfiles+[batch]:
+            if os.path.exists(f): os.remove(f)
+
+        self.assertEqual(out.returncode,0)
+        self.assertEqual(exists,[True,True,False])
+        for lineno in [2,3,4]:
+            self.assertIn('Skipping line %i of %s'%(lineno,batch),out.stderr)
+        self.assertIn('Processed 2 files (0 failed)',out.stdout)
+
+    def test_cache(self):
+        """Skip unchanged inputs using the output cache."""
+        cache = 'test_cache'
+        cmd = "mkauthlist -f -v --cache-dir %s --cache-size 0 %s %s"%(cache,self.csv,self.tex)
+        print(cmd)
+        subprocess.check_output(cmd,shell=True,stderr=subprocess.DEVNULL)
+        mtime = os.stat(self.tex).st_mtime_ns
+        entries = os.listdir(cache)
+        self.assertEqual(len(entries),1)
+
+        # Cached: the input is not parsed and the output is not rewritten
+        out = subprocess.check_output(cmd,shell=True,stderr=subprocess.STDOUT,
+                                      universal_newlines=True)
+        self.assertIn('Found cached output',out)
+        self.assertIn('is up to date',out)
+        self.assertEqual(os.stat(self.tex).st_mtime_ns,mtime)
+        self.assertEqual(os.listdir(cache),entries)
+
+        # An edited output is restored from the cache
+        with open(self.tex) as f:
+            text = f.read()
+        with open(self.tex,'a') as f:
+            f.write('edited')
+        subprocess.check_output(cmd,shell=True,stderr=subprocess.DEVNULL)
+        with open(self.tex) as f:
+            self.assertEqual(f.read(),text)
+
+        # Changed options: new entry, the old one is evicted
+        subprocess.check_output(cmd+' --sort',shell=True,stderr=subprocess.DEVNULL)
+        self.assertNotEqual(os.stat(self.tex).st_mtime_ns,mtime)
+        self.assertEqual(len(os.listdir(cache)),1)
+        self.assertNotEqual(os.listdir(cache),entries)
+
+        # The header records the current command line
+        subprocess.check_output(cmd+' --sort -c DES',shell=True,stderr=subprocess.DEVNULL)
+        with open(self.tex) as f:
+            self.assertIn('--sort -c DES',f.readlines()[1])
+        shutil.rmtree(cache)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed")
+    def test_cache_write_table(self):
+        """Write the table on a cache hit."""
+        cache, table = 'test_cache', 'test_cache.feather'
+        cmd = "mkauthlist -f --cache-dir %s --write-table %s %s %s"%(
+            cache,table,self.csv,self.tex)
+        print(cmd)
+        for i in range(2):
+            subprocess.check_output(cmd,shell=True)
+            self.assertTrue(os.path.exists(table))
+            os.remove(table)
+        self.assertEqual(len(os.listdir(cache)),1)
+        shutil.rmtree(cache)
+
+    def test_watch(self):
+        """Regenerate the output when the input files change."""
+        def wait_for(condition, timeout=20):
+            start = time.time()
+            while not condition():
+                if time.time() - start > timeout:
+                    self.fail("Timed out")
+                time.sleep(0.05)
+
+        def read(filename):
+            if not os.path.exists(filename): return ''
+            with open(filename) as f:
+                text = f.read()
+            # Only complete outputs
+            return text if text.rstrip().endswith('}') else ''
+
+        for mode in ['','--poll']:
+            cmd = "mkauthlist --watch %s -j mnras -a %s --cntrb %s %s %s"%(
+                mode,self.order,self.cntrb,self.csv,self.tex)
+            print(cmd)
+            proc = subprocess.Popen(cmd.split())
+            try:
+                wait_for(lambda: 'Melchior' in read(self.tex))
+
+                # Edit the csv file
+                with open(self.csv) as f:
+                    text = f.read()
+                with open(self.csv,'w') as f:
+                    f.write(text.replace('P.~Melchior','P.~Melchior-Watched'))
+                wait_for(lambda: 'Melchior-Watched' in read(self.tex))
+
+                # Edit the ordering file
+                with open(self.order,'w') as f:
+                    f.write('Drlica-Wagner,Alex\n')
+                wait_for(lambda: 0 <= read(self.tex).find('Drlica-Wagner') <
+                         read(self.tex).find('Melchior-Watched'))
+
+                # Restore a deleted output
+                os.remove(self.tex)
+                wait_for(lambda: 'Melchior-Watched' in read(self.tex))
+
+                # Keep a hand-edited output (the contributions are written last)
+                with open(self.tex) as f:
+                    edited = f.read() + '% edited\n'
+                with open(self.tex,'w') as f:
+                    f.write(edited)
+                with open(self.csv,'w') as f:
+                    f.write(text.replace('P.~Melchior','P.~Melchior-Again'))
+                wait_for(lambda: 'Melchior-Again' in open(self.cntrb).read())
+                with open(self.tex) as f:
+                    self.assertEqual(f.read(),edited)
+                with open(self.csv,'w') as f:
+                    f.write(text.replace('P.~Melchior','P.~Melchior-Watched'))
+                with open(self.tex,'w') as f:
+                    f.write(edited.replace('% edited\n',''))
+                wait_for(lambda: 'Melchior-Watched' in open(self.cntrb).read())
+            finally:
+                proc.terminate()
+                proc.wait()
+
+            full = 'full_author_list.tex'
+            cmd = "mkauthlist -f -j mnras -a %s %s %s"%(self.order,self.csv,full)
+            subprocess.check_output(cmd,shell=True)
+            self.assertEqual(read(self.tex).splitlines()[2:],read(full).splitlines()[2:])
+            os.remove(self.tex); os.remove(full)
+            shutil.copy('data/'+self.csv,self.csv)
+            shutil.copy('data/'+self.order,self.order)
+
+    def test_no_force(self):
+        """Don't overwrite existing output without '--force'."""
+        with open(self.tex,'w') as f:
+            f.write('existing')
+        cmd = "mkauthlist %s %s"%(self.csv,self.tex)
+        print(cmd)
+        subprocess.check_output(cmd,shell=True)
+        with open(self.tex,'r') as f:
+            self.assertEqual(f.read(),'existing')
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Test downloading author lists from a stand-in PubDB server.
+"""
+import os
+import shutil
+import hashlib
+import threading
+import subprocess
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mkauthlist
+
+class PubDBHandler(BaseHTTPRequestHandler):
+    """Serve '/papers/<paper>_author_list.csv' with ETag revalidation."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.client_address,self.path))
+        name = os.path.basename(self.path)
+        body = server.papers.get(name[:-len('_author_list.csv')])
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length','0')
+            self.end_headers()
+            return
+
+        etag = '"%s"'%hashlib.sha1(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag',etag)
+            self.send_header('Content-Length','0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag',etag)
+        self.send_header('Last-Modified','Thu, 01 Oct 2026 00:00:00 GMT')
+        self.send_header('Content-Type','text/csv')
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestFetch(unittest.TestCase):
+
+    def setUp(self):
+        with open('data/example_author_list.csv','rb') as f:
+            self.body = f.read()
+        self.server = ThreadingHTTPServer(('127.0.0.1',0),PubDBHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.papers = {'DES-2020-0001':self.body,
+                              'DES-2020-0002':self.body.replace(b'Melchior',b'Melchoir')}
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.endpoint = 'http://127.0.0.1:%i/papers'%self.server.server_address[1]
+        self.outdir = 'fetch_output'
+        self.cachedir = 'fetch_cache'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        for d in [self.outdir,self.cachedir]:
+            if os.path.exists(d): shutil.rmtree(d)
+
+    def fetch(self, papers, jobs=1):
+        return mkauthlist.fetch(papers, outdir=self.outdir, endpoint=self.endpoint,
+                                cachedir=self.cachedir, jobs=jobs)
+
+    def test_fetch(self):
+        """Download, revalidate, and update author lists."""
+        papers = ['DES-2020-0001','DES-2020-0002','DES-2020-0003']
+        results = self.fetch(papers)
+        self.assertEqual([r[2] for r in results],['downloaded','downloaded','failed'])
+        self.assertIn('404',results[2][3])
+        filename = results[0][1]
+        with open(filename,'rb') as f:
+            self.assertEqual(f.read(),self.body)
+        # One kept-alive connection for all requests
+        self.assertEqual(len(set(c for c,p in self.server.requests)),1)
+
+        # Unchanged: not downloaded again and the file is not rewritten
+        mtime = os.stat(filename).st_mtime_ns
+        results = self.fetch(papers[:2],jobs=2)
+        self.assertEqual([r[2] for r in results],['not modified','not modified'])
+        self.assertEqual(os.stat(filename).st_mtime_ns,mtime)
+
+        # Changed on the server
+        self.server.papers['DES-2020-0001'] = self.body.replace(b'Melchior',b'Melchior2')
+        results = self.fetch(papers[:1])
+        self.assertEqual(results[0][2],'downloaded')
+        with open(filename,'rb') as f:
+            self.assertIn(b'Melchior2',f.read())
+        # No temporary files are left behind
+        self.assertEqual(sorted(os.listdir(self.outdir)),
+                         ['DES-2020-0001_author_list.csv','DES-2020-0002_author_list.csv'])
+        self.assertFalse([f for f in os.listdir(self.cachedir) if f.endswith('.tmp')])
+
+    def test_fetch_cli(self):
+        """Fetch from the command line and render the author list."""
+        cmd = "mkauthlist fetch --endpoint %s -o %s --cache-dir %s DES-2020-0002"%(
+            self.endpoint,self.outdir,self.cachedir)
+        print(cmd)
+        out = subprocess.check_output(cmd,shell=True,universal_newlines=True)
+        self.assertIn('downloaded',out)
+
+        csv = os.path.join(self.outdir,'DES-2020-0002_author_list.csv')
+        cmd = "mkauthlist -j arxiv %s"%csv
+        print(cmd)
+        out = subprocess.check_output(cmd,shell=True,universal_newlines=True)
+        self.assertIn('P. Melchoir',out)
+
+if __name__ == "__main__":
+    unittest.main()
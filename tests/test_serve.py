@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Test the rendering server.
+"""
+import os
+import socket
+import subprocess
+import unittest
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import mkauthlist
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix socket."""
+    def __init__(self, path):
+        http.client.HTTPConnection.__init__(self,'localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+class TestServe(unittest.TestCase):
+
+    def setUp(self):
+        self.csv = 'data/example_author_list.csv'
+        self.socket = 'test_serve.sock'
+        self.procs = []
+
+    def tearDown(self):
+        for proc in self.procs:
+            proc.terminate()
+            proc.wait()
+            proc.stdout.close()
+        if os.path.exists(self.socket):
+            os.remove(self.socket)
+
+    def start(self, options):
+        cmd = "mkauthlist serve %s"%options
+        print(cmd)
+        proc = subprocess.Popen(cmd.split(),stdout=subprocess.PIPE,
+                                universal_newlines=True)
+        self.procs.append(proc)
+        return proc.stdout.readline().split()[-1]
+
+    def request(self, conn, query, body=None):
+        conn.request('POST' if body else 'GET','/render?'+query,body=body)
+        response = conn.getresponse()
+        return response.status, response.read().decode('utf-8')
+
+    def test_serve(self):
+        """Render uploaded and local csv files concurrently."""
+        address = self.start('--port 0 --root .')
+        host,port = urllib.parse.urlsplit(address).netloc.split(':')
+        with open(self.csv,'rb') as f:
+            body = f.read()
+
+        data = mkauthlist.load(self.csv)
+        queries = []
+        for journal in ['apj','revtex','mnras','elsevier','arxiv']:
+            for collab in ['DES Collaboration','LSST DESC']:
+                kwargs = dict(journal=journal,collaboration=collab)
+                query = urllib.parse.urlencode(dict(journal=journal,collab=collab))
+                queries.append((query,mkauthlist.render(data,**kwargs)))
+        query = 'journal=mnras&sort=1&path=%s'%self.csv
+        expected = mkauthlist.render(mkauthlist.order(data,sort=True),journal='mnras')
+        queries.append((query,expected))
+
+        def check(args):
+            query,expected = args
+            conn = http.client.HTTPConnection(host,int(port))
+            upload = None if 'path=' in query else body
+            status,output = self.request(conn,query,upload)
+            conn.close()
+            return status == 200 and output == expected
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(check,queries*10))
+        self.assertTrue(all(results))
+
+        conn = http.client.HTTPConnection(host,int(port))
+        self.assertEqual(self.request(conn,'journal=nature',body)[0],400)
+        self.assertEqual(self.request(conn,'path=missing.csv')[0],404)
+        # Files outside of the root are refused whether or not they exist
+        for path in ['/etc/passwd','../missing.csv','data/../../missing.csv']:
+            self.assertEqual(self.request(conn,'path=%s'%path)[0],403)
+        self.assertEqual(self.request(conn,'aux=/etc/passwd',body)[0],403)
+        conn.close()
+
+    def test_no_root(self):
+        """Refuse to read files without a root directory."""
+        address = self.start('--port 0')
+        host,port = urllib.parse.urlsplit(address).netloc.split(':')
+        conn = http.client.HTTPConnection(host,int(port))
+        for query in ['path=%s'%self.csv,'path=missing.csv']:
+            self.assertEqual(self.request(conn,query)[0],403)
+        conn.close()
+
+    def test_unix_socket(self):
+        """Render over a Unix socket."""
+        self.start('--socket %s --root data'%self.socket)
+        conn = UnixHTTPConnection(self.socket)
+        status,output = self.request(conn,'journal=arxiv&path=%s'%os.path.basename(self.csv))
+        conn.close()
+        self.assertEqual(status,200)
+        self.assertEqual(output,mkauthlist.render(mkauthlist.load(self.csv),
+                                                  journal='arxiv'))
+
+if __name__ == "__main__":
+    unittest.main()
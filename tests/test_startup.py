@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Guard the start-up time of the command line tool.
+"""
+__author__ = "Alex Drlica-Wagner"
+import sys
+import shutil
+import subprocess
+import unittest
+
+# Generous upper bound on the total import time (seconds)
+MAX_IMPORT_TIME = 0.5
+
+class TestStartup(unittest.TestCase):
+
+    def importtime(self, args):
+        """ Run a python command with '-X importtime'.
+
+        Returns the imported modules and the total import time (s).
+        """
+        cmd = [sys.executable,'-X','importtime'] + args
+        print(' '.join(cmd))
+        out = subprocess.run(cmd,stdout=subprocess.PIPE,stderr=subprocess.PIPE,
+                             universal_newlines=True,check=True)
+        modules, total = [], 0
+        for line in out.stderr.splitlines():
+            if not line.startswith('import time:'): continue
+            fields = line.split('|')
+            try:
+                total += int(fields[0].split(':')[-1])
+            except ValueError:
+                # Header line
+                continue
+            modules.append(fields[-1].strip())
+        return modules, total*1e-6
+
+    def script(self):
+        return shutil.which('mkauthlist')
+
+    def test_help(self):
+        """Answer '--help' without importing numpy."""
+        modules, total = self.importtime([self.script(),'--help'])
+        self.assertNotIn('numpy',modules)
+        self.assertLess(total,MAX_IMPORT_TIME)
+
+    def test_version(self):
+        """Answer '--version' without importing numpy."""
+        modules, total = self.importtime([self.script(),'--version'])
+        self.assertNotIn('numpy',modules)
+        self.assertLess(total,MAX_IMPORT_TIME)
+
+    def test_import(self):
+        """Import the package without numpy."""
+        modules, total = self.importtime(['-c','import mkauthlist'])
+        self.assertNotIn('numpy',modules)
+        self.assertLess(total,MAX_IMPORT_TIME)
+
+if __name__ == "__main__":
+    unittest.main()